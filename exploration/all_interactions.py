@@ -35,77 +35,7 @@ T_PERSON = "ALL_INTERACTIONS"
 
 
 # SQL block --------------------------------------------------------------------
-DDL = f"""
-CREATE OR REPLACE TABLE {T_PERSON} AS
-WITH role_expanded AS (
-    -- JIRA roles
-    SELECT DISTINCT
-        JIRA_REPORTER_ID   AS JIRA_ID,
-        JIRA_REPORTER_NAME AS JIRA_DISPLAY_NAME,
-        JIRA_REPORTER_EMAIL AS JIRA_EMAIL,
-        NULL               AS GITHUB_ID,
-        NULL               AS GITHUB_DISPLAY_NAME,
-        NULL               AS GITHUB_EMAIL,
-        NULL               AS GITHUB_LOGIN,
-        'JIRA_REPORTER'    AS ROLE_TYPE,
-        STORY_ID, STORY_KEY, EPIC_ID, EPIC_KEY,
-        PROJECT_KEY, PROJECT_NAME, REPO
-    FROM {T_LINKS}
-    WHERE JIRA_REPORTER_ID IS NOT NULL
-
-    UNION ALL
-    SELECT DISTINCT
-        JIRA_CREATOR_ID,  JIRA_CREATOR_NAME,  JIRA_CREATOR_EMAIL,
-        NULL, NULL, NULL, NULL,
-        'JIRA_CREATOR',
-        STORY_ID, STORY_KEY, EPIC_ID, EPIC_KEY,
-        PROJECT_KEY, PROJECT_NAME, REPO
-    FROM {T_LINKS}
-    WHERE JIRA_CREATOR_ID IS NOT NULL
-
-    UNION ALL
-    SELECT DISTINCT
-        JIRA_ASSIGNEE_ID, JIRA_ASSIGNEE_NAME, JIRA_ASSIGNEE_EMAIL,
-        NULL, NULL, NULL, NULL,
-        'JIRA_ASSIGNEE',
-        STORY_ID, STORY_KEY, EPIC_ID, EPIC_KEY,
-        PROJECT_KEY, PROJECT_NAME, REPO
-    FROM {T_LINKS}
-    WHERE JIRA_ASSIGNEE_ID IS NOT NULL
-
-    -- GitHub roles
-    UNION ALL
-    SELECT DISTINCT
-        NULL, NULL, NULL,
-        GH_AUTHOR_ID, GH_AUTHOR_NAME, GH_AUTHOR_EMAIL, GH_AUTHOR_LOGIN,
-        'GH_AUTHOR',
-        STORY_ID, STORY_KEY, EPIC_ID, EPIC_KEY,
-        PROJECT_KEY, PROJECT_NAME, REPO
-    FROM {T_LINKS}
-    WHERE GH_AUTHOR_ID IS NOT NULL
-
-    UNION ALL
-    SELECT DISTINCT
-        NULL, NULL, NULL,
-        GH_COMMITTER_ID, GH_COMMITTER_NAME, GH_COMMITTER_EMAIL, GH_COMMITTER_LOGIN,
-        'GH_COMMITTER',
-        STORY_ID, STORY_KEY, EPIC_ID, EPIC_KEY,
-        PROJECT_KEY, PROJECT_NAME, REPO
-    FROM {T_LINKS}
-    WHERE GH_COMMITTER_ID IS NOT NULL
-
-    UNION ALL
-    SELECT DISTINCT
-        NULL, NULL, NULL,
-        PR_USER_ID, NULL, NULL, PR_USER_LOGIN,
-        'PR_USER',
-        STORY_ID, STORY_KEY, EPIC_ID, EPIC_KEY,
-        PROJECT_KEY, PROJECT_NAME, REPO
-    FROM {T_LINKS}
-    WHERE PR_USER_ID IS NOT NULL
-),
-joined AS (
-    SELECT
+_JOINED_COLS = """\
         -- Coalesce: prefer data from RESOLVABLE_USERS, else fall back to role-data
         COALESCE(u.JIRA_ID,      r.JIRA_ID)         AS JIRA_ID,
         COALESCE(u.JIRA_DISPLAY_NAME, r.JIRA_DISPLAY_NAME) AS JIRA_DISPLAY_NAME,
@@ -128,13 +58,115 @@ joined AS (
         CASE
             WHEN u.JIRA_ID IS NULL AND u.GITHUB_ID IS NULL THEN 'UNRESOLVED'
             ELSE 'RESOLVED'
-        END AS RESOLVE_STATUS
+        END AS RESOLVE_STATUS"""
+
+DDL = f"""
+CREATE OR REPLACE TABLE {T_PERSON} AS
+WITH role_expanded AS (
+    -- single scan of {T_LINKS}: each link row fans out into one entry per role
+    -- (deduplicated once, by the final SELECT DISTINCT)
+    SELECT
+        x.role_row.JIRA_ID,
+        x.role_row.JIRA_DISPLAY_NAME,
+        x.role_row.JIRA_EMAIL,
+        x.role_row.GITHUB_ID,
+        x.role_row.GITHUB_DISPLAY_NAME,
+        x.role_row.GITHUB_EMAIL,
+        x.role_row.GITHUB_LOGIN,
+        x.role_row.ROLE_TYPE,
+        x.STORY_ID, x.STORY_KEY, x.EPIC_ID, x.EPIC_KEY,
+        x.PROJECT_KEY, x.PROJECT_NAME, x.REPO
+    FROM (
+        SELECT
+            STORY_ID, STORY_KEY, EPIC_ID, EPIC_KEY,
+            PROJECT_KEY, PROJECT_NAME, REPO,
+            UNNEST([
+                -- JIRA roles
+                STRUCT_PACK(
+                    JIRA_ID := JIRA_REPORTER_ID,
+                    JIRA_DISPLAY_NAME := JIRA_REPORTER_NAME,
+                    JIRA_EMAIL := JIRA_REPORTER_EMAIL,
+                    GITHUB_ID := NULL,
+                    GITHUB_DISPLAY_NAME := NULL,
+                    GITHUB_EMAIL := NULL,
+                    GITHUB_LOGIN := NULL,
+                    ROLE_TYPE := 'JIRA_REPORTER'
+                ),
+                STRUCT_PACK(
+                    JIRA_ID := JIRA_CREATOR_ID,
+                    JIRA_DISPLAY_NAME := JIRA_CREATOR_NAME,
+                    JIRA_EMAIL := JIRA_CREATOR_EMAIL,
+                    GITHUB_ID := NULL,
+                    GITHUB_DISPLAY_NAME := NULL,
+                    GITHUB_EMAIL := NULL,
+                    GITHUB_LOGIN := NULL,
+                    ROLE_TYPE := 'JIRA_CREATOR'
+                ),
+                STRUCT_PACK(
+                    JIRA_ID := JIRA_ASSIGNEE_ID,
+                    JIRA_DISPLAY_NAME := JIRA_ASSIGNEE_NAME,
+                    JIRA_EMAIL := JIRA_ASSIGNEE_EMAIL,
+                    GITHUB_ID := NULL,
+                    GITHUB_DISPLAY_NAME := NULL,
+                    GITHUB_EMAIL := NULL,
+                    GITHUB_LOGIN := NULL,
+                    ROLE_TYPE := 'JIRA_ASSIGNEE'
+                ),
+                -- GitHub roles
+                STRUCT_PACK(
+                    JIRA_ID := NULL,
+                    JIRA_DISPLAY_NAME := NULL,
+                    JIRA_EMAIL := NULL,
+                    GITHUB_ID := GH_AUTHOR_ID,
+                    GITHUB_DISPLAY_NAME := GH_AUTHOR_NAME,
+                    GITHUB_EMAIL := GH_AUTHOR_EMAIL,
+                    GITHUB_LOGIN := GH_AUTHOR_LOGIN,
+                    ROLE_TYPE := 'GH_AUTHOR'
+                ),
+                STRUCT_PACK(
+                    JIRA_ID := NULL,
+                    JIRA_DISPLAY_NAME := NULL,
+                    JIRA_EMAIL := NULL,
+                    GITHUB_ID := GH_COMMITTER_ID,
+                    GITHUB_DISPLAY_NAME := GH_COMMITTER_NAME,
+                    GITHUB_EMAIL := GH_COMMITTER_EMAIL,
+                    GITHUB_LOGIN := GH_COMMITTER_LOGIN,
+                    ROLE_TYPE := 'GH_COMMITTER'
+                ),
+                STRUCT_PACK(
+                    JIRA_ID := NULL,
+                    JIRA_DISPLAY_NAME := NULL,
+                    JIRA_EMAIL := NULL,
+                    GITHUB_ID := PR_USER_ID,
+                    GITHUB_DISPLAY_NAME := NULL,
+                    GITHUB_EMAIL := NULL,
+                    GITHUB_LOGIN := PR_USER_LOGIN,
+                    ROLE_TYPE := 'PR_USER'
+                )
+            ]) AS role_row
+        FROM {T_LINKS}
+    ) x
+    WHERE x.role_row.JIRA_ID IS NOT NULL OR x.role_row.GITHUB_ID IS NOT NULL
+),
+-- every role row carries exactly one of JIRA_ID / GITHUB_ID, so the identity
+-- lookup splits into two equi-joins (hash joins) instead of one OR-join
+joined_jira AS (
+    SELECT
+{_JOINED_COLS}
+    FROM role_expanded r
+    LEFT JOIN {T_USERS} u ON u.JIRA_ID = r.JIRA_ID
+    WHERE r.JIRA_ID IS NOT NULL
+),
+joined_gh AS (
+    SELECT
+{_JOINED_COLS}
     FROM role_expanded r
-    LEFT JOIN {T_USERS} u
-      ON (u.JIRA_ID   = r.JIRA_ID   AND r.JIRA_ID   IS NOT NULL)
-      OR (u.GITHUB_ID = r.GITHUB_ID AND r.GITHUB_ID IS NOT NULL)
+    LEFT JOIN {T_USERS} u ON u.GITHUB_ID = r.GITHUB_ID
+    WHERE r.GITHUB_ID IS NOT NULL
 )
-SELECT DISTINCT * FROM joined;
+SELECT DISTINCT * FROM joined_jira
+UNION ALL
+SELECT DISTINCT * FROM joined_gh;
 """
 
 
@@ -11,6 +11,7 @@ from models import CommitterInfo
 from scripts.paths import DATA_DIR
 from utils.helpers import db_manager
 from agents.agent_builder import build_agent
+from exploration.gh_user_inference_info import BLOCK_SEP
 from utils.logging_setup import setup_logging
 
 """
@@ -33,7 +34,7 @@ load_dotenv()
 setup_logging()
 log = logging.getLogger(__name__)
 
-T_COMMITTERS = "COMMITTER_DIFFS"
+T_COMMITTERS = "COMMITTER_DIFF_BLOCKS"
 T_INFER = "DEVELOPER_INFERENCE"
 DB_PATH = Path(DATA_DIR, f"{os.environ['DUCKDB_STAGING_NAME']}.duckdb")
 LIMIT = int(os.getenv("COMMITTER_INFER_LIMIT", 1000))
@@ -53,19 +54,38 @@ def _load_committers(
 
     if T_INFER in tables:
         q = f"""
-            SELECT COMMITTER_ID, COMMITTER_NAME, AGGREGATED_DIFFS
+            SELECT COMMITTER_ID, COMMITTER_NAME, DIFF_BLOCKS
             FROM   {T_COMMITTERS}
             WHERE  COMMITTER_ID NOT IN (SELECT COMMITTER_ID FROM {T_INFER})
             LIMIT  {limit};
         """
     else:
         q = f"""
-            SELECT COMMITTER_ID, COMMITTER_NAME, AGGREGATED_DIFFS
+            SELECT COMMITTER_ID, COMMITTER_NAME, DIFF_BLOCKS
             FROM   {T_COMMITTERS}
             LIMIT  {limit};
         """
 
-    return conn.execute(q).fetchall()
+    return [
+        (committer_id, name, _join_blocks(blocks, N_CHARS))
+        for committer_id, name, blocks in conn.execute(q).fetchall()
+    ]
+
+
+def _join_blocks(blocks: Optional[List[str]], n_chars: int) -> Optional[str]:
+    """
+    Join diff blocks with BLOCK_SEP, stopping once n_chars are covered.
+    """
+    if not blocks:
+        return None
+    parts: List[str] = []
+    total = -len(BLOCK_SEP)  # no separator ahead of the first block
+    for block in blocks:
+        parts.append(block)
+        total += len(BLOCK_SEP) + len(block)
+        if total >= n_chars:
+            break
+    return BLOCK_SEP.join(parts)
 
 
 def _insert_committer_analysis(
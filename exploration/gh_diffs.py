@@ -1,16 +1,16 @@
 from __future__ import annotations
 import os
+import httpx
+import asyncio
 import logging
+import pandas as pd
 from pathlib import Path
-from github import Github
 from dotenv import load_dotenv
 from scripts.paths import DATA_DIR
 from collections import defaultdict
-from utils.helpers import db_manager
+from utils.helpers import GITHUB_API_URL, db_manager, github_get, github_headers
 from typing import Dict, List, Tuple, Set
 from utils.logging_setup import setup_logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from github.GithubException import GithubException, UnknownObjectException
 
 # Configuration ----------------------------------------------------------------
 load_dotenv()
@@ -23,10 +23,12 @@ SRC_STG_DB = Path(DATA_DIR, f"{os.environ['DUCKDB_STAGING_NAME']}.duckdb")
 T_COMMITS = "GITHUB_COMMITS"
 T_COMMIT_FILES = "GITHUB_DIFFS"
 T_USERS_GH = "CONSOLIDATED_GH_USERS"
+T_SKIPPED = "GITHUB_SKIPPED_COMMITS"
 
 MAX_WORKERS = 10
-_GH_TOKEN = os.getenv("GITHUB_PERSONAL_ACCESS_TOKEN")
-_G = Github(_GH_TOKEN, per_page=100, retry=3)
+HTTP_RETRIES = 3  # per request, on 5xx, connection resets and secondary limits
+FLUSH_ROWS = 10_000  # staged file rows held in memory before an insert
+MAX_FILES_PER_COMMIT = 200  # larger (merge/vendoring) commits are skipped
 
 # DDL --------------------------------------------------------------------------
 DDL_COMMIT_FILES = f"""
@@ -43,11 +45,46 @@ CREATE TABLE IF NOT EXISTS {T_COMMIT_FILES} (
 );
 """
 
+# Commits over MAX_FILES_PER_COMMIT, kept so they are not re-queued next run
+DDL_SKIPPED_COMMITS = f"""
+CREATE TABLE IF NOT EXISTS {T_SKIPPED} (
+    ORG             TEXT,
+    REPO            TEXT,
+    COMMIT_SHA      TEXT,
+    FILE_COUNT      INTEGER,
+    PRIMARY KEY (ORG, REPO, COMMIT_SHA)
+);
+"""
+
+_FILE_COLS = (
+    "ORG",
+    "REPO",
+    "COMMIT_SHA",
+    "COMMIT_TIMESTAMP",
+    "COMMITTER_ID",
+    "COMMITTER_NAME",
+    "FILE_PATH",
+    "CODE_TEXT",
+)
+
+# Registered DataFrame goes through DuckDB's columnar scan in PK order
+INSERT_STAGED_FILES = f"""
+INSERT INTO "{T_COMMIT_FILES}"
+SELECT * FROM TMP_COMMIT_FILES
+ORDER BY ORG, REPO, COMMIT_SHA, FILE_PATH
+ON CONFLICT DO NOTHING;
+"""
+
+INSERT_SKIPPED = f"""
+INSERT INTO "{T_SKIPPED}" VALUES (?, ?, ?, ?)
+ON CONFLICT DO NOTHING;
+"""
+
 
 # Helpers ----------------------------------------------------------------------
 def _commits_missing_files(conn) -> List[Tuple[str, str, str, str, str]]:
     """
-    Return (ORG, REPO, COMMIT_SHA, COMMIT_TIMESTAMP, GITHUB_ID, GITHUB_DISPLAY_NAME) for every commit that has no diff staged yet, resolving the user through CONSOLIDATED_GH_USERS.
+    Return (ORG, REPO, COMMIT_SHA, COMMIT_TIMESTAMP, GITHUB_ID, GITHUB_DISPLAY_NAME) for every commit that has no diff staged and was not skipped, resolving the user through CONSOLIDATED_GH_USERS.
     """
     q = f"""
         SELECT
@@ -58,107 +95,181 @@ def _commits_missing_files(conn) -> List[Tuple[str, str, str, str, str]]:
             u.GITHUB_ID,
             u.GITHUB_DISPLAY_NAME
         FROM "{T_COMMITS}" c
+        -- staged commits collapse to one key each, so the anti-join is a
+        -- plain hash probe filtered on the NULL side
+        LEFT JOIN (
+            SELECT DISTINCT ORG, REPO, COMMIT_SHA FROM "{T_COMMIT_FILES}"
+        ) f
+        ON  f.ORG = c.ORG
+        AND f.REPO = c.REPO
+        AND f.COMMIT_SHA = c.COMMIT_SHA
+        LEFT JOIN "{T_SKIPPED}" s
+        ON  s.ORG = c.ORG
+        AND s.REPO = c.REPO
+        AND s.COMMIT_SHA = c.COMMIT_SHA
         LEFT JOIN "{T_USERS_GH}" u
         ON u.GITHUB_ID   = c.COMMITTER_ID
         OR u.GITHUB_LOGIN = c.COMMITTER_LOGIN
-        WHERE u.GITHUB_ID IS NOT NULL
-        AND NOT EXISTS (
-                SELECT 1 FROM "{T_COMMIT_FILES}" f
-                WHERE f.ORG = c.ORG
-                AND f.REPO = c.REPO
-                AND f.COMMIT_SHA = c.COMMIT_SHA
-        );
+        WHERE f.COMMIT_SHA IS NULL
+        AND s.COMMIT_SHA IS NULL
+        AND u.GITHUB_ID IS NOT NULL;
     """
     return conn.execute(q).fetchall()
 
 
 # GitHub API calls -------------------------------------------------------------
-def _files_for_commit(repo_obj, sha: str) -> List[Tuple[str, str]]:
-    try:
-        commit = repo_obj.get_commit(sha)
-    except UnknownObjectException:
-        log.warning("Commit not found: %s@%s", repo_obj.full_name, sha)
-        return []
-    except GithubException as exc:
-        log.error("Commit fetch error %s@%s: %s", repo_obj.full_name, sha, exc)
-        return []
+# GraphQL exposes no per-file patches, so commits are fetched over REST; all
+# requests share one keep-alive client and are bounded by MAX_WORKERS. Returns
+# the (path, patch) pairs and the commit's file count.
+async def _files_for_commit(
+    client: httpx.AsyncClient, sem: asyncio.Semaphore, full_name: str, sha: str
+) -> Tuple[List[Tuple[str, str]], int]:
+    async with sem:
+        resp = await github_get(
+            client, f"/repos/{full_name}/commits/{sha}", retries=HTTP_RETRIES
+        )
+    if resp.status_code == 404:
+        log.warning("Commit not found: %s@%s", full_name, sha)
+        return [], 0
+    if not resp.is_success:
+        log.error(
+            "Commit fetch error %s@%s: %s %s",
+            full_name,
+            sha,
+            resp.status_code,
+            resp.text[:200],
+        )
+        return [], 0
+
+    files = resp.json().get("files") or []
+    if len(files) > MAX_FILES_PER_COMMIT:
+        log.warning(
+            "Skipping %s@%s: %d+ files exceeds cap of %d",
+            full_name,
+            sha,
+            len(files),
+            MAX_FILES_PER_COMMIT,
+        )
+        return [], len(files)
 
     out: List[Tuple[str, str]] = []
-    for f in commit.files:
-        if getattr(f, "status", "") == "removed":
+    for f in files:
+        if f.get("status") == "removed":
             continue
-        patch = getattr(f, "patch", None)  # this is the unified diff
+        patch = f.get("patch")  # this is the unified diff
         if patch is not None:
-            out.append((f.filename, patch))
-    return out
+            out.append((f["filename"], patch))
+    return out, len(files)
+
+
+def _insert_file_rows(conn, cols: Dict[str, List]):
+    n_rows = len(cols["ORG"])
+    if not n_rows:
+        return
+    df = pd.DataFrame(cols, columns=_FILE_COLS)
+    conn.register("TMP_COMMIT_FILES", df)
+    conn.execute(INSERT_STAGED_FILES)
+    conn.unregister("TMP_COMMIT_FILES")
+    conn.commit()
+    log.info("Inserted %d code diffs into %s", n_rows, T_COMMIT_FILES)
 
 
-def _insert_file_rows(rows: List[Tuple[str, str, str, str, str, str, str, str]]):
+def _insert_skipped(conn, rows: List[Tuple[str, str, str, int]]):
     if not rows:
         return
-    with db_manager(SRC_STG_DB) as conn:
-        conn.execute(DDL_COMMIT_FILES)
-        conn.executemany(
-            f'INSERT INTO "{T_COMMIT_FILES}" VALUES (?,?,?,?,?,?,?, ?)'
-            " ON CONFLICT DO NOTHING;",
-            rows,
-        )
-        conn.commit()
-        log.info("Inserted %d code diffs into %s", len(rows), T_COMMIT_FILES)
+    conn.executemany(INSERT_SKIPPED, rows)
+    conn.commit()
+    log.info("Recorded %d oversized commits in %s", len(rows), T_SKIPPED)
 
 
 # Core logic -------------------------------------------------------------------
-def main():
-    with db_manager(SRC_STG_DB) as conn:
-        conn.execute(DDL_COMMIT_FILES)
-        todo = _commits_missing_files(conn)
+async def _fetch_commit(
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    info: Tuple[str, str, str, str, str, str],
+) -> Tuple[Tuple[str, str, str, str, str, str], List[Tuple[str, str]], int]:
+    org, repo, sha = info[:3]
+    files, n_files = await _files_for_commit(client, sem, f"{org}/{repo}", sha)
+    return info, files, n_files
+
+
+async def _collect_files(
+    conn,
+    per_repo: Dict[Tuple[str, str], Dict[str, Tuple[str, str, str]]],
+) -> int:
+    # column lists (one per _FILE_COLS entry) plus a PK set guarding re-stages
+    staged: Dict[str, List] = {c: [] for c in _FILE_COLS}
+    seen: Set[Tuple[str, str, str, str]] = set()
+    skipped: List[Tuple[str, str, str, int]] = []
+
+    sem = asyncio.Semaphore(MAX_WORKERS)
+    async with httpx.AsyncClient(
+        base_url=GITHUB_API_URL,
+        headers=github_headers(),
+        timeout=30.0,
+    ) as client:
+        tasks = [
+            _fetch_commit(client, sem, (org, repo, sha, ts, gh_id, gh_name))
+            for (org, repo), commit_infos in per_repo.items()
+            for sha, (ts, gh_id, gh_name) in commit_infos.items()
+        ]
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                (org, repo, sha, ts, gh_id, gh_name), files, n_files = await next_done
+            except Exception as exc:
+                log.error("Commit fetch failed: %s", exc)
+                continue
+            if n_files > MAX_FILES_PER_COMMIT:
+                skipped.append((org, repo, sha, n_files))
+                continue
+            for path, code in files:
+                key = (org, repo, sha, path)
+                if key in seen:
+                    continue
+                seen.add(key)
+                for col, val in zip(
+                    _FILE_COLS, (org, repo, sha, ts, gh_id, gh_name, path, code)
+                ):
+                    staged[col].append(val)
+
+            if len(staged["ORG"]) >= FLUSH_ROWS:
+                _insert_file_rows(conn, staged)
+                for col in staged.values():
+                    col.clear()
+
+    _insert_file_rows(conn, staged)
+    _insert_skipped(conn, skipped)
+    return len(seen)
+
+
+def run(conn) -> None:
+    """Stage missing commit diffs on a caller-owned connection."""
+    conn.execute(DDL_COMMIT_FILES)
+    conn.execute(DDL_SKIPPED_COMMITS)
+    todo = _commits_missing_files(conn)
 
     if not todo:
         log.info("No new commits require diff staging.")
         return
 
-    per_repo: Dict[Tuple[str, str], Set[Tuple[str, str, str, str]]] = defaultdict(set)
+    # keyed by commit SHA: a commit matched through several users is fetched
+    # once, and only the first match is staged (the PK drops the rest anyway)
+    per_repo: Dict[Tuple[str, str], Dict[str, Tuple[str, str, str]]] = defaultdict(dict)
     for org, repo, sha, ts, gh_id, gh_name in todo:
-        per_repo[(org, repo)].add((sha, ts, gh_id, gh_name))
+        per_repo[(org, repo)].setdefault(sha, (ts, gh_id, gh_name))
 
-    staged_rows: List[Tuple[str, str, str, str, str, str, str, str]] = []
     log.info(
-        "Fetching code diffs for %d commits across %d repos", len(todo), len(per_repo)
+        "Fetching code diffs for %d commits across %d repos",
+        sum(len(v) for v in per_repo.values()),
+        len(per_repo),
     )
+    n_staged = asyncio.run(_collect_files(conn, per_repo))
+    log.info("Done staging %d diffs", n_staged)
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
-        futures = {}
-        for (org, repo), commit_infos in per_repo.items():
-            try:
-                log.info("Searching repo: %s", repo)
-                repo_obj = _G.get_repo(f"{org}/{repo}")
-            except UnknownObjectException:
-                log.warning("Repo not found: %s/%s", org, repo)
-                continue
-            except GithubException as exc:
-                log.error("Repo fetch error %s/%s: %s", org, repo, exc)
-                continue
-
-            for sha, ts, gh_id, gh_name in commit_infos:
-                futures[pool.submit(_files_for_commit, repo_obj, sha)] = (
-                    org,
-                    repo,
-                    sha,
-                    ts,
-                    gh_id,
-                    gh_name,
-                )
-
-        for fut in as_completed(futures):
-            org, repo, sha, ts, gh_id, gh_name = futures[fut]
-            try:
-                for path, code in fut.result():
-                    staged_rows.append((org, repo, sha, ts, gh_id, gh_name, path, code))
-            except Exception as exc:
-                log.error("Worker error for %s/%s@%s: %s", org, repo, sha, exc)
 
-    _insert_file_rows(staged_rows)
-    log.info("Done staging %d diffs", len(staged_rows))
+def main():
+    with db_manager(SRC_STG_DB) as conn:
+        run(conn)
 
 
 if __name__ == "__main__":
@@ -15,13 +15,14 @@ Aggregates and annotates GitHub commit diffs per committer into a unified table.
 
 Description
 -----------
-Generates the COMMITTER_DIFFS table by processing raw GitHub diff data from the GITHUB_DIFFS source table. Groups diffs by committer, combines multiple diffs into a single formatted string, and records metadata and the committer's earliest code change.
+Generates the COMMITTER_DIFFS view by processing raw GitHub diff data from the GITHUB_DIFFS source table. Groups diffs by committer, keeps their formatted diff blocks as a list, and records metadata and the committer's earliest code change.
 
     1. Filters out null or empty CODE_TEXT and null COMMITTER_ID entries.
     2. Orders commit diffs by descending COMMIT_TIMESTAMP (most recent first).
-    3. Aggregates commit diffs into a single block until character length cap is reached.
+    3. Truncates each diff to DIFF_CHAR_CAP, then aggregates them into a single block until the character length cap is reached.
     4. Captures how many file diffs each committer contributed and total character length.
     5. Extracts first diff content based on earliest COMMIT_TIMESTAMP.
+    6. Stores the blocks as a list (DIFF_BLOCKS) in COMMITTER_DIFF_BLOCKS; the COMMITTER_DIFFS view over it exposes them joined with BLOCK_SEP as AGGREGATED_DIFFS.
 """
 
 # Configuration ----------------------------------------------------------------
@@ -31,23 +32,51 @@ log = logging.getLogger(__name__)
 STG_DB = Path(DATA_DIR, f"{os.environ['DUCKDB_STAGING_NAME']}.duckdb")
 T_DIFFS = "GITHUB_DIFFS"
 T_AGG = "COMMITTER_DIFFS"
+T_BLOCKS = "COMMITTER_DIFF_BLOCKS"
+BLOCK_SEP = "\n\n### NEXT CODE CHANGE ###\n\n"
 CHAR_CAP = 100_000
+DIFF_CHAR_CAP = 10_000  # per-diff truncation, applied before aggregation
 
 # SQL block --------------------------------------------------------------------
+# Running code length is windowed over key columns only; CODE_TEXT is then read
+# back just for rows whose preceding diffs still fit under CHAR_CAP (a block is
+# never shorter than its diff, so the Python cap loop never needs the rest)
 SQL_ORDERED_DIFFS = f"""
+WITH sized AS (
+    SELECT
+        ORG,
+        REPO,
+        COMMIT_SHA,
+        FILE_PATH,
+        COALESCE(
+            SUM(LEAST(LENGTH(CODE_TEXT), {DIFF_CHAR_CAP})) OVER (
+                PARTITION BY COMMITTER_ID
+                ORDER BY COMMIT_TIMESTAMP DESC, COMMIT_SHA, FILE_PATH
+                ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            ),
+            0
+        ) AS PRIOR_CHARS
+    FROM {T_DIFFS}
+    WHERE COMMITTER_ID IS NOT NULL
+      AND CODE_TEXT IS NOT NULL
+      AND CODE_TEXT != ''
+)
 SELECT
-    COMMITTER_ID,
-    COMMITTER_NAME,
-    COMMIT_TIMESTAMP,
-    COMMIT_SHA,
-    REPO,
-    FILE_PATH,
-    CODE_TEXT AS CODE_DIFF
-FROM {T_DIFFS}
-WHERE COMMITTER_ID IS NOT NULL
-  AND CODE_TEXT IS NOT NULL
-  AND CODE_TEXT != ''
-ORDER BY COMMITTER_ID, COMMIT_TIMESTAMP DESC
+    d.COMMITTER_ID,
+    d.COMMITTER_NAME,
+    d.COMMIT_TIMESTAMP,
+    d.COMMIT_SHA,
+    d.REPO,
+    d.FILE_PATH,
+    LEFT(d.CODE_TEXT, {DIFF_CHAR_CAP}) AS CODE_DIFF
+FROM sized s
+JOIN {T_DIFFS} d
+  ON  d.ORG = s.ORG
+  AND d.REPO = s.REPO
+  AND d.COMMIT_SHA = s.COMMIT_SHA
+  AND d.FILE_PATH = s.FILE_PATH
+WHERE s.PRIOR_CHARS <= {CHAR_CAP}
+ORDER BY d.COMMITTER_ID, d.COMMIT_TIMESTAMP DESC, d.COMMIT_SHA, d.FILE_PATH
 """
 
 SQL_FIRST_DIFFS = f"""
@@ -99,14 +128,14 @@ def aggregate_diffs(df: pd.DataFrame, first_diffs: dict, char_cap: int):
             if total_chars > char_cap:
                 break
 
-        aggregated_text = "\n\n### NEXT CODE CHANGE ###\n\n".join(aggregated_blocks)
+        # blocks stay a list; readers join only as much as they need
         results.append(
             {
                 "COMMITTER_ID": committer_id,
                 "COMMITTER_NAME": committer_name,
                 "DIFF_COUNTS": count,
-                "AGGREGATED_DIFFS": aggregated_text,
-                "AGGREGATED_DIFF_LENGTH": len(aggregated_text),
+                "DIFF_BLOCKS": aggregated_blocks,
+                "AGGREGATED_DIFF_LENGTH": total_chars + len(BLOCK_SEP) * (count - 1),
                 "FIRST_DIFF": first_diffs.get(committer_id, ""),
             }
         )
@@ -125,21 +154,40 @@ def main() -> None:
 
         rows = aggregate_diffs(df, first_diffs, CHAR_CAP)
 
-        conn.execute(f"DROP TABLE IF EXISTS {T_AGG}")
-        conn.execute(f"""
-            CREATE TABLE {T_AGG} (
-                COMMITTER_ID TEXT,
-                COMMITTER_NAME TEXT,
-                DIFF_COUNTS INTEGER,
-                AGGREGATED_DIFFS TEXT,
-                AGGREGATED_DIFF_LENGTH INTEGER,
-                FIRST_DIFF TEXT
-            )
-        """)
         conn.register("agg_results", pd.DataFrame(rows))
+        try:
+            conn.execute(f"""
+                CREATE OR REPLACE TABLE {T_BLOCKS} AS
+                SELECT
+                    CAST(COMMITTER_ID AS TEXT)              AS COMMITTER_ID,
+                    CAST(COMMITTER_NAME AS TEXT)            AS COMMITTER_NAME,
+                    CAST(DIFF_COUNTS AS INTEGER)            AS DIFF_COUNTS,
+                    CAST(DIFF_BLOCKS AS TEXT[])             AS DIFF_BLOCKS,
+                    CAST(AGGREGATED_DIFF_LENGTH AS INTEGER) AS AGGREGATED_DIFF_LENGTH,
+                    CAST(FIRST_DIFF AS TEXT)                AS FIRST_DIFF
+                FROM agg_results
+            """)
+        finally:
+            conn.unregister("agg_results")
+
+        # replace a table left by earlier runs; a view is replaced in place
+        existing = conn.execute(
+            "SELECT table_type FROM information_schema.tables WHERE table_name = ?",
+            (T_AGG,),
+        ).fetchone()
+        if existing and existing[0] == "BASE TABLE":
+            conn.execute(f"DROP TABLE {T_AGG}")
+        # AGGREGATED_DIFFS is joined lazily, only for rows a reader touches
         conn.execute(f"""
-            INSERT INTO {T_AGG}
-            SELECT * FROM agg_results
+            CREATE OR REPLACE VIEW {T_AGG} AS
+            SELECT
+                COMMITTER_ID,
+                COMMITTER_NAME,
+                DIFF_COUNTS,
+                ARRAY_TO_STRING(DIFF_BLOCKS, '{BLOCK_SEP}') AS AGGREGATED_DIFFS,
+                AGGREGATED_DIFF_LENGTH,
+                FIRST_DIFF
+            FROM {T_BLOCKS}
         """)
         log.info("Committer diff code aggregation complete — %d rows", len(rows))
 
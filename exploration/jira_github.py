@@ -6,6 +6,7 @@ from dotenv import load_dotenv
 from scripts.paths import DATA_DIR
 from utils.helpers import db_manager
 from utils.logging_setup import setup_logging
+from typing import Dict, Tuple
 from datetime import datetime, timedelta, timezone
 
 """
@@ -111,6 +112,14 @@ _SELECT_LIST = """
 # JIRA_GITHUB SQL --------------------------------------------------------------
 SQL_CREATE_JIRA_GITHUB = f"""
 CREATE OR REPLACE TABLE {T_LINKS} AS
+WITH GC AS (
+    SELECT * FROM GITHUB_COMMITS
+    WHERE EXTRACTED_JIRA_KEY IS NOT NULL AND EXTRACTED_JIRA_KEY != ''
+),
+GP AS (
+    SELECT * FROM GITHUB_PRS
+    WHERE EXTRACTED_JIRA_KEY IS NOT NULL AND EXTRACTED_JIRA_KEY != ''
+)
 SELECT
     JS.ID AS STORY_ID,
     JS.KEY AS STORY_KEY,
@@ -148,22 +157,11 @@ SELECT
     GP.USER_LOGIN AS PR_USER_LOGIN
 
 FROM JIRA_STORIES JS
+LEFT JOIN GC ON JS.KEY = GC.EXTRACTED_JIRA_KEY
+LEFT JOIN GP ON JS.KEY = GP.EXTRACTED_JIRA_KEY
 
-LEFT JOIN GITHUB_COMMITS GC
-    ON JS.KEY = GC.EXTRACTED_JIRA_KEY
-    AND GC.EXTRACTED_JIRA_KEY IS NOT NULL AND GC.EXTRACTED_JIRA_KEY != ''
-
-LEFT JOIN GITHUB_PRS GP
-    ON JS.KEY = GP.EXTRACTED_JIRA_KEY
-    AND GP.EXTRACTED_JIRA_KEY IS NOT NULL AND GP.EXTRACTED_JIRA_KEY != ''
-
-WHERE JS.KEY IN (
-    SELECT EXTRACTED_JIRA_KEY FROM GITHUB_COMMITS
-    WHERE EXTRACTED_JIRA_KEY IS NOT NULL AND EXTRACTED_JIRA_KEY != ''
-    UNION
-    SELECT EXTRACTED_JIRA_KEY FROM GITHUB_PRS
-    WHERE EXTRACTED_JIRA_KEY IS NOT NULL AND EXTRACTED_JIRA_KEY != ''
-);
+-- keep stories linked to at least one commit or PR
+WHERE GC.EXTRACTED_JIRA_KEY IS NOT NULL OR GP.EXTRACTED_JIRA_KEY IS NOT NULL;
 """
 
 
@@ -177,7 +175,9 @@ def _stage_jira_stories() -> None:
             FROM   "{SCHEMA_JIRA}"."{T_SRC}" s
             WHERE  s."ISSUE_TYPE_NAME" = 'Story'
               AND  s."UPDATED_DATE" >= ?
-            ORDER  BY s."UPDATED_DATE" DESC
+            -- PK order for the insert; newest first within an ID so that
+            -- DO NOTHING keeps the latest version of any duplicate
+            ORDER  BY s."ID", s."UPDATED_DATE" DESC
             """,
             (cutoff,),
         ).fetchall()
@@ -186,17 +186,25 @@ def _stage_jira_stories() -> None:
         log.info("No Jira stories found in the last %d days.", DAYS_BACK)
         return
 
-    records = [dict(zip(_COLS, row)) for row in rows]
+    # _SELECT_LIST yields columns in _COLS order, so rows insert as-is
+    assert len(rows[0]) == len(_COLS)
+
+    # one row per ID (the newest, given the ORDER BY) so the statement never
+    # carries same-key duplicates into ON CONFLICT
+    unique: Dict[str, Tuple] = {}
+    for row in rows:
+        unique.setdefault(row[0], row)
+    rows = list(unique.values())
 
     with db_manager(STG_DB) as conn:
         conn.execute(DDL_STORIES)
         conn.executemany(
             f"""INSERT INTO "{T_STORIES}" VALUES ({",".join("?" * len(_COLS))})
                 ON CONFLICT (ID) DO NOTHING;""",
-            [tuple(r[c] for c in _COLS) for r in records],
+            rows,
         )
         conn.commit()
-        log.info("Inserted %d rows into %s", len(records), T_STORIES)
+        log.info("Inserted %d rows into %s", len(rows), T_STORIES)
 
 
 def _stage_jira_github_links() -> None:
@@ -22,7 +22,23 @@ T_GITHUB = "JIRA_GITHUB"
 # SQL block --------------------------------------------------------------------
 DDL = f"""
 CREATE OR REPLACE TABLE {T_TARGET} AS
-WITH links AS (
+WITH story_people AS (
+    -- one row per (story, role holder) so users join on a single equality
+    SELECT DISTINCT s.ID, p.PERSON_ID
+    FROM {T_STORIES} s,
+         UNNEST([s.REPORTER_ID, s.CREATOR_ID, s.ASSIGNEE_ID]) AS p(PERSON_ID)
+),
+story_repos AS (
+    -- ID and KEY matches as two equi-joins instead of one OR-join
+    SELECT s.ID, g.REPO
+    FROM {T_STORIES} s
+    JOIN {T_GITHUB} g ON g.STORY_ID = s.ID
+    UNION
+    SELECT s.ID, g.REPO
+    FROM {T_STORIES} s
+    JOIN {T_GITHUB} g ON g.STORY_KEY = s.KEY
+),
+links AS (
     SELECT
         u.JIRA_ID,
         u.JIRA_DISPLAY_NAME,
@@ -35,15 +51,11 @@ WITH links AS (
         s.PROJECT_KEY,
         s.PROJECT_NAME,
 
-        g.REPO
+        r.REPO
     FROM {T_USERS}   u
-    JOIN {T_STORIES} s
-      ON u.JIRA_ID = s.REPORTER_ID
-      OR u.JIRA_ID = s.CREATOR_ID
-      OR u.JIRA_ID = s.ASSIGNEE_ID
-
-    LEFT JOIN {T_GITHUB} g
-      ON (g.STORY_ID  = s.ID  OR g.STORY_KEY = s.KEY)
+    JOIN story_people sp ON sp.PERSON_ID = u.JIRA_ID
+    JOIN {T_STORIES} s   ON s.ID = sp.ID
+    LEFT JOIN story_repos r ON r.ID = s.ID
 ),
 aggregated AS (
     SELECT
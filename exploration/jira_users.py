@@ -4,7 +4,7 @@ Creates a standardized directory of JIRA user profiles in the staging database.
 Steps
 -----
 1. Fetches user data from the USERS_SUMMARY table in the JIRA data source.
-2. Processes these records (ensures uniqueness).
+2. Deduplicates by account ID and lower-cases emails in SQL.
 3. Upserts the records into a JIRA_USER_PROFILES table in the staging db.
 """
 
@@ -16,7 +16,6 @@ from pathlib import Path
 from dotenv import load_dotenv
 from scripts.paths import DATA_DIR
 from utils.helpers import db_manager
-from typing import Any, Dict, List, Tuple
 from utils.logging_setup import setup_logging
 
 
@@ -41,91 +40,65 @@ CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
 );
 """
 
-SELECT_USERS = f"""
-SELECT
-    "ID"   AS ACCOUNT_ID,
-    "NAME" AS DISPLAY_NAME,
-    "EMAIL"AS EMAIL
-FROM "{MAIN_JIRA_SCHEMA}"."USERS_SUMMARY"
-WHERE "ID" IS NOT NULL;
-"""
+ATTACH_SRC = f"ATTACH '{READ_DB}' AS src (READ_ONLY);"
+DETACH_SRC = "DETACH src;"
 
+# One row per account ID (first name wins), emails normalised to lower-case;
+# unchanged profiles are skipped rather than rewritten
 UPSERT_SQL = f"""
 INSERT INTO "{TABLE_NAME}" (
     ACCOUNT_ID,
     DISPLAY_NAME,
     EMAIL
-) VALUES (?, ?, ?)
+)
+SELECT
+    ACCOUNT_ID,
+    DISPLAY_NAME,
+    LOWER(EMAIL) AS EMAIL
+FROM (
+    SELECT
+        CAST("ID" AS TEXT)    AS ACCOUNT_ID,
+        CAST("NAME" AS TEXT)  AS DISPLAY_NAME,
+        CAST("EMAIL" AS TEXT) AS EMAIL,
+        ROW_NUMBER() OVER (
+            PARTITION BY "ID" ORDER BY "NAME" NULLS LAST
+        ) AS rn
+    FROM src."{MAIN_JIRA_SCHEMA}"."USERS_SUMMARY"
+    WHERE "ID" IS NOT NULL AND CAST("ID" AS TEXT) <> ''
+)
+WHERE rn = 1
 ON CONFLICT (ACCOUNT_ID) DO UPDATE SET
     DISPLAY_NAME  = excluded.DISPLAY_NAME,
     EMAIL = excluded.EMAIL
+WHERE "{TABLE_NAME}".DISPLAY_NAME IS DISTINCT FROM excluded.DISPLAY_NAME
+   OR "{TABLE_NAME}".EMAIL IS DISTINCT FROM excluded.EMAIL
 """
 
 
 # Helpers ----------------------------------------------------------------------
-def _coerce(val: Any, *, lower: bool = False) -> str | None:
-    if val is None:
-        return None
-    s = str(val)
-    return s.lower() if lower else s
-
-
 def _ensure_table(conn: duckdb.DuckDBPyConnection) -> None:
     conn.execute(DDL)
     log.info("Ensured table %s exists", TABLE_NAME)
 
 
-def _fetch_users(conn: duckdb.DuckDBPyConnection) -> List[Tuple[Any, ...]]:
-    log.info("Querying %s.USERS_SUMMARY", MAIN_JIRA_SCHEMA)
-    return conn.execute(SELECT_USERS).fetchall()
-
-
-# Record builder ---------------------------------------------------------------
-def _build_records() -> List[Dict[str, Any]]:
-    with db_manager(READ_DB, read_only=True) as conn:
-        rows = _fetch_users(conn)
-        log.info("Fetched %d JIRA users", len(rows))
-
-    profiles: Dict[str, Dict[str, Any]] = {}
-
-    for acc_id, disp, EMAIL in rows:
-        key = _coerce(acc_id)
-        if not key:
-            log.debug("Skipping row without ID: %s", (acc_id, disp, EMAIL))
-            continue
-
-        # First-come wins; change to overwrite logic?
-        profiles.setdefault(
-            key,
-            dict(
-                ACCOUNT_ID=key,
-                DISPLAY_NAME=_coerce(disp),
-                EMAIL=_coerce(EMAIL, lower=True),
-            ),
-        )
-
-    log.info("Built %d unique JIRA user profiles", len(profiles))
-    return list(profiles.values())
-
-
-# Insert -----------------------------------------------------------------------
-def _insert(records: List[Dict[str, Any]]) -> None:
-    if not records:
-        log.info("Nothing to insert.")
-        return
-
+# Upsert -----------------------------------------------------------------------
+def _upsert_users() -> None:
     with db_manager(WRITE_DB) as conn:
         _ensure_table(conn)
 
-        rows = [(r["ACCOUNT_ID"], r["DISPLAY_NAME"], r["EMAIL"]) for r in records]
-        conn.executemany(UPSERT_SQL, rows)
+        log.info("Querying %s.USERS_SUMMARY", MAIN_JIRA_SCHEMA)
+        conn.execute(ATTACH_SRC)
+        try:
+            n = conn.execute(UPSERT_SQL).fetchone()[0]
+        finally:
+            conn.execute(DETACH_SRC)
         conn.commit()
-        log.info("Upserted %d profiles into %s", len(rows), TABLE_NAME)
+        log.info("Upserted %d profiles into %s", n, TABLE_NAME)
 
 
 # Entry point ------------------------------------------------------------------
 def main() -> None:
-    _insert(_build_records())
+    _upsert_users()
 
 
 if __name__ == "__main__":
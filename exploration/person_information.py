@@ -14,10 +14,11 @@ Description
 -----------
 Builds the PERSON_INFORMATION table by joining developer inference results with interaction history. Combines identity metadata from interactions with structured role and skill information, and aggregates all related story, epic, project, and repository references.
 
-    1. Aggregates all distinct artefacts (story, epic, repo, etc.) touched by each GitHub user.
-    2. Extracts display name, email, and login from interaction records for identity enrichment.
-    3. Merges the aggregated artefacts and identity with developer inference outputs (role, experience level, skills).
-    4. Ensures all array fields are initialized as empty arrays if no data is present.
+    1. Aggregates, in a single pass over interactions per GitHub user:
+        a. All distinct artefacts (story, epic, repo, etc.) they touched.
+        b. Display name, email, and login for identity enrichment.
+    2. Merges the aggregated artefacts and identity with developer inference outputs (role, experience level, skills).
+    3. Ensures all array fields are initialized as empty arrays if no data is present.
 
 Each developer is represented by a single row keyed by GitHub ID.
 """
@@ -35,8 +36,8 @@ T_PERSON = "PERSON_INFORMATION"
 # SQL block --------------------------------------------------------------------
 DDL = f"""
 CREATE OR REPLACE TABLE {T_PERSON} AS
-WITH  -- collect artefacts the person touched
-artefacts AS (
+WITH  -- artefacts the person touched plus one identity record, in one pass
+agg AS (
     SELECT
         GITHUB_ID,
         ARRAY_AGG(DISTINCT STORY_KEY)     AS STORY_KEYS,
@@ -45,15 +46,8 @@ artefacts AS (
         ARRAY_AGG(DISTINCT EPIC_ID)       AS EPIC_IDS,
         ARRAY_AGG(DISTINCT PROJECT_KEY)   AS PROJECT_KEYS,
         ARRAY_AGG(DISTINCT PROJECT_NAME)  AS PROJECT_NAMES,
-        ARRAY_AGG(DISTINCT REPO)          AS REPOS
-    FROM {T_INTERACTIONS}
-    GROUP BY GITHUB_ID
-),
+        ARRAY_AGG(DISTINCT REPO)          AS REPOS,
 
--- one record of basic identity pulled from interactions
-identity_meta AS (
-    SELECT
-        GITHUB_ID,
         MAX(GITHUB_DISPLAY_NAME) AS GITHUB_DISPLAY_NAME,
         MAX(GITHUB_EMAIL)        AS GITHUB_EMAIL,
         MAX(GITHUB_LOGIN)        AS GITHUB_LOGIN,
@@ -68,13 +62,13 @@ SELECT
     d.COMMITTER_ID                                   AS GITHUB_ID,
 
     /* fall-back to COMMITTER_NAME if no interaction record */
-    COALESCE(im.GITHUB_DISPLAY_NAME, d.COMMITTER_NAME) AS GITHUB_DISPLAY_NAME,
-    im.GITHUB_EMAIL,
-    im.GITHUB_LOGIN,
+    COALESCE(a.GITHUB_DISPLAY_NAME, d.COMMITTER_NAME) AS GITHUB_DISPLAY_NAME,
+    a.GITHUB_EMAIL,
+    a.GITHUB_LOGIN,
 
-    im.JIRA_ID,
-    im.JIRA_DISPLAY_NAME,
-    im.JIRA_EMAIL,
+    a.JIRA_ID,
+    a.JIRA_DISPLAY_NAME,
+    a.JIRA_EMAIL,
 
     d.ROLE,
     d.EXPERIENCE_LEVEL,
@@ -89,9 +83,8 @@ SELECT
     COALESCE(a.PROJECT_NAMES,  ARRAY[]::TEXT[]) AS PROJECT_NAMES,
     COALESCE(a.REPOS,          ARRAY[]::TEXT[]) AS REPOS
 
-FROM {T_INFERENCE}      d
-LEFT JOIN identity_meta im ON im.GITHUB_ID = d.COMMITTER_ID
-LEFT JOIN artefacts     a  ON a.GITHUB_ID  = d.COMMITTER_ID;
+FROM {T_INFERENCE} d
+LEFT JOIN agg a ON a.GITHUB_ID = d.COMMITTER_ID;
 """
 
 
@@ -6,7 +6,7 @@ Steps
 1. Query unique users from GITHUB_COMMITS (using COMMITTER_*)
 2. Query unique users from GITHUB_PRS (using USER_*)
 3. Normalize fields and unify into single record set
-4. Upsert deduplicated records into RESOLVABLE_GITHUB_USERS table
+4. Merge deduplicated records into RESOLVABLE_GITHUB_USERS via a temp table
 """
 
 from __future__ import annotations
@@ -36,61 +36,69 @@ CREATE TABLE IF NOT EXISTS {T_TARGET} (
 );
 """
 
-UPSERT = """
-WITH combined AS (
+# Source rows are deduplicated once into a temp table and merged with the
+# current state there, so the target only sees a keyed delete + plain insert
+UPSERT = f"""
+CREATE OR REPLACE TEMP TABLE TMP_RESOLVABLE AS
+WITH commits_agg AS (
+    -- one representative commit identity per id: smallest (name, email),
+    -- NULL fields last
     SELECT
         COMMITTER_ID AS GITHUB_ID,
-        COMMITTER_NAME AS GITHUB_DISPLAY_NAME,
-        COMMITTER_EMAIL AS GITHUB_EMAIL,
-        COMMITTER_LOGIN AS GITHUB_LOGIN
+        ARG_MIN(
+            STRUCT_PACK(
+                GITHUB_DISPLAY_NAME := COMMITTER_NAME,
+                GITHUB_EMAIL := COMMITTER_EMAIL,
+                GITHUB_LOGIN := COMMITTER_LOGIN
+            ),
+            STRUCT_PACK(COMMITTER_NAME, COMMITTER_EMAIL)
+        ) AS usr
     FROM DATA_STAGING.main.GITHUB_COMMITS
     WHERE COMMITTER_ID IS NOT NULL
-
-    UNION ALL
-
+    GROUP BY COMMITTER_ID
+),
+prs_agg AS (
+    -- PRs only carry a login
     SELECT
         USER_ID AS GITHUB_ID,
-        NULL AS GITHUB_DISPLAY_NAME,
-        NULL AS GITHUB_EMAIL,
-        USER_LOGIN AS GITHUB_LOGIN
+        ANY_VALUE(USER_LOGIN) AS GITHUB_LOGIN
     FROM DATA_STAGING.main.GITHUB_PRS
     WHERE USER_ID IS NOT NULL
-),
-ranked AS (
-    SELECT *,
-           ROW_NUMBER() OVER (
-               PARTITION BY GITHUB_ID
-               ORDER BY GITHUB_DISPLAY_NAME NULLS LAST, GITHUB_EMAIL NULLS LAST
-           ) AS rk
-    FROM combined
-)
-INSERT INTO RESOLVABLE_GITHUB_USERS (
-    GITHUB_ID,
-    GITHUB_DISPLAY_NAME,
-    GITHUB_EMAIL,
-    GITHUB_LOGIN
+    GROUP BY USER_ID
 )
 SELECT
     GITHUB_ID,
-    GITHUB_DISPLAY_NAME,
-    GITHUB_EMAIL,
-    GITHUB_LOGIN
-FROM ranked
-WHERE rk = 1
-ON CONFLICT (GITHUB_ID) DO UPDATE SET
-    GITHUB_DISPLAY_NAME  = COALESCE(excluded.GITHUB_DISPLAY_NAME, RESOLVABLE_GITHUB_USERS.GITHUB_DISPLAY_NAME),
-    GITHUB_EMAIL = COALESCE(excluded.GITHUB_EMAIL, RESOLVABLE_GITHUB_USERS.GITHUB_EMAIL),
-    GITHUB_LOGIN = COALESCE(excluded.GITHUB_LOGIN, RESOLVABLE_GITHUB_USERS.GITHUB_LOGIN);
+    COALESCE(c.usr.GITHUB_DISPLAY_NAME, r.GITHUB_DISPLAY_NAME) AS GITHUB_DISPLAY_NAME,
+    COALESCE(c.usr.GITHUB_EMAIL, r.GITHUB_EMAIL)               AS GITHUB_EMAIL,
+    COALESCE(c.usr.GITHUB_LOGIN, p.GITHUB_LOGIN, r.GITHUB_LOGIN) AS GITHUB_LOGIN
+FROM commits_agg c
+FULL OUTER JOIN prs_agg p USING (GITHUB_ID)
+LEFT JOIN {T_TARGET} r USING (GITHUB_ID);
+
+DELETE FROM {T_TARGET}
+WHERE GITHUB_ID IN (SELECT GITHUB_ID FROM TMP_RESOLVABLE);
+
+INSERT INTO {T_TARGET}
+SELECT GITHUB_ID, GITHUB_DISPLAY_NAME, GITHUB_EMAIL, GITHUB_LOGIN
+FROM TMP_RESOLVABLE
+ORDER BY GITHUB_ID;  -- PK order keeps index inserts local
+
+DROP TABLE TMP_RESOLVABLE;
 """
 
 
 # Pipeline ---------------------------------------------------------------------
+def run(conn) -> None:
+    """Merge resolvable GitHub users on a caller-owned connection."""
+    conn.execute(DDL)
+    conn.execute(UPSERT)
+    conn.commit()
+    log.info("Merged resolvable GitHub users into %s", T_TARGET)
+
+
 def _stage():
     with db_manager(STG_DB) as conn:
-        conn.execute(DDL)
-        conn.execute(UPSERT)
-        conn.commit()
-        log.info("Upserted resolvable GitHub users into %s", T_TARGET)
+        run(conn)
 
 
 # Entry point ------------------------------------------------------------------
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import atexit
+import copy
 import json
 import logging
 import os
+import threading
+from collections import OrderedDict
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Literal
 
 import click
 import duckdb
@@ -21,6 +25,47 @@ from scripts.paths import CONFIG_DIR, DATA_DIR
 
 log = logging.getLogger(__name__)
 
+# libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# orjson is optional; fall back to the stdlib encoder/decoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Parsed config files keyed by absolute path: (mtime, size, data)
+_YAML_CACHE: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+_YAML_CACHE_MAX = 100
+
+
+def _read_yaml(path: str | os.PathLike) -> Any:
+    """Parses a YAML file, reusing the cached result while its mtime/size are unchanged.
+
+    Args:
+        path (str | os.PathLike): Path to the YAML file.
+
+    Returns:
+        Any: A deep copy of the parsed YAML contents.
+    """
+    cache_key = str(Path(path).resolve())
+    st = os.stat(cache_key)
+    cached = _YAML_CACHE.get(cache_key)
+    if cached and cached[0] == st.st_mtime and cached[1] == st.st_size:
+        _YAML_CACHE.move_to_end(cache_key)
+        return copy.deepcopy(cached[2])
+
+    with open(cache_key, "rb") as f:
+        data = yaml.load(f, Loader=_YamlLoader)
+    _YAML_CACHE[cache_key] = (st.st_mtime, st.st_size, data)
+    _YAML_CACHE.move_to_end(cache_key)
+    if len(_YAML_CACHE) > _YAML_CACHE_MAX:
+        _YAML_CACHE.popitem(last=False)
+    return copy.deepcopy(data)
+
 
 def load_yaml(file, key=None):
     """Loads and parses a YAML file from the CONFIG_DIR.
@@ -33,14 +78,10 @@ def load_yaml(file, key=None):
         dict | Any: Parsed YAML contents, or the sub-dictionary at `key` if specified.
     """
     try:
-        path = CONFIG_DIR / f"{file}.yaml"
-        with open(path, "r") as f:
-            if key:
-                return yaml.safe_load(f)[key]
-            else:
-                return yaml.safe_load(f)
+        data = _read_yaml(CONFIG_DIR / f"{file}.yaml")
+        return data[key] if key else data
     except Exception as e:
-        log.error(f"Error loading {file}: {e}")
+        log.error("Error loading %s: %s", file, e)
 
 
 def resolve_model(
@@ -80,20 +121,53 @@ def resolve_model(
                     temperature=temperature,
                 )
     except Exception as e:
-        log.error(f"Error loading LLM provider/model: {e}")
+        log.error("Error loading LLM provider/model: %s", e)
 
 
-def validate_response(output_content, response_model, savefile=None):
+def _json_loads(text: str | bytes) -> Any:
+    """Decodes JSON with orjson when installed, else the stdlib."""
+    return orjson.loads(text) if orjson else json.loads(text)
+
+
+def _write_json(path: str | os.PathLike, obj: Any) -> None:
+    """Writes indented JSON to `path` with orjson when installed, else the stdlib."""
+    if orjson:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(obj, f, indent=2)
+
+
+def _write_parquet(path: str | os.PathLike, obj: Dict[str, Any]) -> None:
+    """Writes a single record to a zstd-compressed Parquet file (needs pyarrow)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq.write_table(pa.Table.from_pylist([obj]), path, compression="zstd")
+
+
+def validate_response(
+    output_content,
+    response_model,
+    savefile=None,
+    fmt: Literal["json", "parquet"] = "json",
+):
     """Validates structured output against a Pydantic schema and optionally saves it.
 
     Args:
         output_content (str | dict | BaseModel): The agent response to validate. If a string, it is parsed as JSON.
         response_model (BaseModel): The expected Pydantic schema to validate against.
         savefile (str, optional): If provided, saves validated output to `test_outputs/{savefile}.json`.
+        fmt (str, optional): 'json' (default) or 'parquet'; Parquet output can be read directly by DuckDB's read_parquet and requires pyarrow.
 
     Returns:
         BaseModel | dict | None: A validated instance of `response_model` or raw fallback dict.
     """
+    # Already validated and nothing to save: skip the parse/construct machinery
+    if not savefile and isinstance(output_content, response_model):
+        return output_content
+
     try:
         # Convert to JSON if response not structured (like Google)
         if isinstance(output_content, str):
@@ -104,14 +178,16 @@ def validate_response(output_content, response_model, savefile=None):
             output_content = response_model(**output_content)
 
         if savefile:
-            output_path = DATA_DIR / f"{savefile}.json"
-            with open(output_path, "w") as f:
-                json.dump(output_content.model_dump(), f, indent=4)
-                log.info(f"Saved structured output to {output_path}")
+            output_path = DATA_DIR / f"{savefile}.{fmt}"
+            if fmt == "parquet":
+                _write_parquet(output_path, output_content.model_dump())
+            else:
+                _write_json(output_path, output_content.model_dump())
+            log.info("Saved structured output to %s", output_path)
 
         return output_content
     except IOError as e:
-        log.error(f"Failed to write output file {output_path}: {e}")
+        log.error("Failed to write output file %s: %s", output_path, e)
 
     # Handle case if content isn't a Pydantic model
     except AttributeError:
@@ -119,8 +195,7 @@ def validate_response(output_content, response_model, savefile=None):
 
         # Fallback: try saving raw content
         try:
-            with open(output_path.with_suffix(".raw.json"), "w") as f:
-                json.dump(output_content, f, indent=4)
+            _write_json(output_path.with_suffix(".raw.json"), output_content)
         except Exception:
             log.error("Could not save raw output content.")
             return None
@@ -136,6 +211,9 @@ def validate_output(output_content, schema):
     Returns:
         BaseModel: A validated instance of the provided schema.
     """
+    if isinstance(output_content, schema):
+        return output_content
+
     try:
         # Convert to JSON if response not structured (like Google)
         if isinstance(output_content, str):
@@ -167,12 +245,13 @@ def parse_json(json_string: str):
         # Strip whitespace
         text = json_string.strip()
 
-        # Remove ticks if necessary
-        text = text.strip().strip("`")
-        if text.startswith("json"):
-            text = text[4:].strip()
+        # Remove ticks if necessary (bare JSON skips this entirely)
+        if not text.startswith(("{", "[")):
+            text = text.strip("`")
+            if text.startswith("json"):
+                text = text[4:].lstrip()
 
-        return json.loads(text)
+        return _json_loads(text)
     except (json.JSONDecodeError, TypeError):
         return None
 
@@ -181,7 +260,7 @@ def safe_json(blob: Any) -> Dict[str, Any]:
     """Attempts to return a JSON-compatible dictionary from any input.
 
     Args:
-        blob (Any): A JSON string, dict-like object, or any arbitrary input.
+        blob (Any): A JSON string/bytes, dict-like object, or any arbitrary input.
 
     Returns:
         dict[str, Any]: Parsed dictionary if possible; otherwise an empty dict.
@@ -190,29 +269,121 @@ def safe_json(blob: Any) -> Dict[str, Any]:
         return {}
     if isinstance(blob, dict):
         return blob
-    if isinstance(blob, (str, bytes, bytearray)):
+    if isinstance(blob, (str, bytes, bytearray, memoryview)):
+        # orjson takes buffers directly; the stdlib needs bytes
+        if isinstance(blob, memoryview) and not orjson:
+            blob = blob.tobytes()
         try:
-            return json.loads(blob)
-        except json.JSONDecodeError:
-            log.debug("Bad JSON blob ignored: %s", blob)
+            return _json_loads(blob)
+        except ValueError:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Bad JSON blob ignored: %s", blob)
     return {}
 
 
+class DuckDBPool:
+    """Keeps DuckDB connections open between `db_manager(pooled=True)` calls.
+
+    Idle connections are pooled per (database path, read_only) and at most
+    `max_connections` are kept for each. In-memory databases are never pooled.
+    """
+
+    def __init__(self, max_connections: int = 4):
+        self.max_connections = max_connections
+        self._idle: Dict[tuple[str, bool], list[duckdb.DuckDBPyConnection]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path, read_only: bool) -> tuple[str, bool] | None:
+        if str(path).startswith(":memory:"):
+            return None
+        return str(Path(path).resolve()), read_only
+
+    def acquire(self, path, read_only: bool = False) -> duckdb.DuckDBPyConnection:
+        key = self._key(path, read_only)
+        if key:
+            with self._lock:
+                idle = self._idle.get(key)
+                if idle:
+                    return idle.pop()
+                # DuckDB refuses a second handle on the same file in the other mode
+                stale = self._idle.pop((key[0], not read_only), [])
+            for conn in stale:
+                conn.close()
+        return duckdb.connect(path, read_only=read_only)
+
+    def release(self, conn: duckdb.DuckDBPyConnection, path, read_only: bool = False):
+        key = self._key(path, read_only)
+        if key:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_connections:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            conns = [conn for idle in self._idle.values() for conn in idle]
+            self._idle.clear()
+        for conn in conns:
+            conn.close()
+
+
+_DB_POOL = DuckDBPool()
+atexit.register(_DB_POOL.close_all)
+
+
+def _db_pragmas() -> Dict[str, Any]:
+    """Default connection settings; read at call time since scripts load .env after import."""
+    pragmas = {"threads": os.cpu_count() or 4, "enable_object_cache": "true"}
+    # DuckDB's own default (80% of RAM) applies unless overridden
+    if os.getenv("DUCKDB_MEMORY_LIMIT"):
+        pragmas["memory_limit"] = f"'{os.environ['DUCKDB_MEMORY_LIMIT']}'"
+    return pragmas
+
+
 @contextmanager
-def db_manager(path: Path, *, read_only: bool = False):
+def db_manager(
+    path: Path,
+    *,
+    read_only: bool = False,
+    pragmas: dict | None = None,
+    pooled: bool = False,
+):
     """Context manager for managing a DuckDB connection.
 
+    The connection is closed on exit, releasing the file lock. With
+    `pooled=True` it is instead borrowed from and returned to a process-wide
+    pool (closed if the block raises). Only opt in when the caller owns every
+    use of that file in the process: an idle pooled handle keeps the file
+    locked, blocks ATTACH of the same file, and carries session state (TEMP
+    tables, registered frames, SETs) over to the next borrower.
+
     Args:
         path (Path): Filesystem path to the DuckDB database.
         read_only (bool, optional): If True, opens the connection in read-only mode.
+        pragmas (dict, optional): PRAGMA name -> value applied to the connection. Defaults to
+            threads = CPU count, enable_object_cache = true, and memory_limit from DUCKDB_MEMORY_LIMIT if set.
+        pooled (bool, optional): Reuse a pooled connection instead of opening a fresh one.
 
     Yields:
         duckdb.DuckDBPyConnection: An active DuckDB connection instance.
     """
-    conn = duckdb.connect(path, read_only=read_only)
+    if pooled:
+        conn = _DB_POOL.acquire(path, read_only=read_only)
+    else:
+        conn = duckdb.connect(path, read_only=read_only)
     try:
+        for name, value in (_db_pragmas() if pragmas is None else pragmas).items():
+            conn.execute(f"PRAGMA {name}={value}")
         yield conn
-    finally:
+    except BaseException:
+        conn.close()
+        raise
+    if pooled:
+        _DB_POOL.release(conn, path, read_only=read_only)
+    else:
         conn.close()
 
 
@@ -98,19 +98,15 @@ def resolve_pr_users():
         unmatched_prs = cx.execute(
             f"""
             SELECT USER_ID AS GITHUB_ID, USER_LOGIN AS GITHUB_LOGIN
-            FROM (
-              SELECT
-                USER_LOGIN,
-                USER_ID,
-                ROW_NUMBER() OVER (PARTITION BY USER_LOGIN ORDER BY UPDATED_AT DESC) AS rn
-              FROM {T_PR}
-            ) sub
-            WHERE rn = 1
-              AND USER_LOGIN NOT IN (
+            FROM {T_PR}
+            WHERE USER_LOGIN NOT IN (
                 SELECT GITHUB_LOGIN FROM {T_MATCHED}
                 UNION
                 SELECT UNNEST(GITHUB_LOGIN_ALIAS) FROM {T_MATCHED}
               )
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY USER_LOGIN ORDER BY UPDATED_AT DESC
+              ) = 1
             """
         ).fetchdf()
 
@@ -65,13 +65,17 @@ UPDATE_SET = ", ".join(f"{c}=excluded.{c}" for c in COLS[1:5])
 
 UPSERT = f"""
 INSERT INTO {T_ATTR} ({",".join(COLS)})
-{SELECT_AGG}
+SELECT * FROM TMP_PERSON_ATTR
 ON CONFLICT ({COLS[0]}) DO UPDATE SET {UPDATE_SET};
 """
 
 
 # Pipeline ---------------------------------------------------------------------
 def run() -> None:
+    # aggregate on a read-only handle so other readers are not blocked
+    with db_manager(DB, read_only=True) as conn:
+        rows = conn.execute(SELECT_AGG).fetchdf()
+
     with db_manager(DB) as conn:
         conn.execute(DDL)
         conn.execute(
@@ -80,12 +84,14 @@ def run() -> None:
         conn.execute(
             f'ALTER TABLE {T_ATTR} ADD COLUMN IF NOT EXISTS "{COLS[4]}" VARCHAR[];'
         )
-        before = conn.execute(f"SELECT COUNT(*) FROM {T_ATTR};").fetchone()[0]
         log.info("Upserting PERSON_ATTRIBUTES ...")
-        conn.execute(UPSERT)
-        conn.commit()
-        after = conn.execute(f"SELECT COUNT(*) FROM {T_ATTR};").fetchone()[0]
-    log.info("PERSON_ATTRIBUTES now %d rows (delta %d)", after, after - before)
+        conn.register("TMP_PERSON_ATTR", rows)
+        try:
+            n = conn.execute(UPSERT).fetchone()[0]  # rows inserted or updated
+            conn.commit()
+        finally:
+            conn.unregister("TMP_PERSON_ATTR")
+    log.info("PERSON_ATTRIBUTES upserted %d rows", n)
 
 
 if __name__ == "__main__":
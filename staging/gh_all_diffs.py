@@ -1,24 +1,25 @@
 from __future__ import annotations
 import os
+import sys
+import gzip
+import json
+import httpx
+import asyncio
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
-from urllib.parse import urlparse
 from datetime import datetime, timezone
-from typing import List, Optional, Set, Tuple
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from github import Github, Auth
-from github.File import File as GHFile
-from github.Commit import Commit as GHCommit
-from github.Repository import Repository as GHRepository
 from github.GithubException import (
     GithubException,
     RateLimitExceededException,
-    UnknownObjectException,
 )
 
 from scripts.paths import DATA_DIR
-from utils.helpers import db_manager
+from utils.helpers import GITHUB_API_URL, db_manager, github_get, github_headers
 from utils.logging_setup import setup_logging
 
 """
@@ -29,13 +30,16 @@ Description
 Fetches and stages GitHub commit diffs and file-level metadata for each known contributor. Stores structured diff records in the GITHUB_DIFFS table, limited by user and per-repo commit counts.
 
     1. Loads contributor GitHub logins and display names from MATCHED_USERS.
-    2. Retrieves all repos in the org, sorted by most recently pushed.
+    2. Retrieves all non-empty repos in the org via GraphQL, sorted by most recently pushed.
     3. For each contributor, fetches new commits from each repo.
     4. For each commit:
         a. Extracts the full commit message.
         b. Extracts per-file patches and change statistics (adds, dels, tot).
     5. Stages structured per-file diff records with message and metadata.
-    6. Limits insertions to MAX_DIFFS_PER_USER per contributor.
+    6. Limits insertions to MAX_DIFFS_PER_USER per contributor, spooling to gzipped NDJSON every DIFF_FLUSH_BATCH rows.
+    7. Bulk-loads all spool files into GITHUB_DIFFS with one read_json insert.
+
+Repo commit listings and per-commit file fetches go straight to the REST API on one shared httpx.AsyncClient. Repos are listed MAX_WORKERS_REPO_FETCH at a time, in push order, and listing stops once the per-user cap is reached; file fetches are bounded by MAX_WORKERS_COMMIT_FETCH. PyGithub is kept for the GraphQL repo listing and its exception types.
 """
 
 
@@ -47,6 +51,7 @@ log = logging.getLogger(__name__)
 COMPANY_ORG_NAME: str = os.getenv("GITHUB_ORG_NAME")
 # DB_PATH = Path(DATA_DIR, f"{os.getenv('DUCKDB_STAGING_NAME')}.duckdb")
 DB_PATH = Path(DATA_DIR, f"{os.getenv('LIVE_DB_NAME')}.duckdb")
+SPOOL_DIR = Path(DATA_DIR, "diff_spool")
 
 T_TARGET_DIFFS = "GITHUB_DIFFS"
 T_SOURCE_USERS = "MATCHED_USERS"
@@ -56,10 +61,28 @@ MAX_DIFFS_PER_USER: int = int(os.getenv("MAX_DIFFS_PER_USER", 200))
 MAX_COMMITS_PER_REPO: int = int(os.getenv("MAX_COMMITS_PER_REPO", 200))
 MAX_WORKERS_REPO_FETCH: int = int(os.getenv("MAX_WORKERS_REPO_FETCH", 5))
 MAX_WORKERS_COMMIT_FETCH: int = int(os.getenv("MAX_WORKERS_COMMIT_FETCH", 10))
+DIFF_FLUSH_BATCH: int = int(os.getenv("DIFF_FLUSH_BATCH", 50))
+HTTP_RETRIES: int = int(os.getenv("HTTP_RETRIES", 3))
 
 _GH_TOKEN = os.getenv("GITHUB_PERSONAL_ACCESS_TOKEN")
 _G = Github(auth=Auth.Token(_GH_TOKEN), per_page=100, retry=3)
 
+_UTC = timezone.utc
+
+# One GraphQL page returns 100 repos with pushedAt already populated
+_REPOS_QUERY = """
+query($org: String!, $cursor: String) {
+  organization(login: $org) {
+    repositories(
+      first: 100, after: $cursor, orderBy: {field: PUSHED_AT, direction: DESC}
+    ) {
+      pageInfo { hasNextPage endCursor }
+      nodes { name nameWithOwner pushedAt isEmpty }
+    }
+  }
+}
+"""
+
 
 # DDL --------------------------------------------------------------------------
 DDL_COMMIT_FILES = f"""
@@ -81,6 +104,50 @@ CREATE TABLE IF NOT EXISTS {T_TARGET_DIFFS} (
 );
 """
 
+_DIFF_COLS = (
+    "ORG",
+    "REPO",
+    "COMMIT_SHA",
+    "COMMIT_TIMESTAMP",
+    "COMMITTER_ID",
+    "COMMITTER_LOGIN",
+    "COMMITTER_NAME",
+    "COMMIT_MESSAGE",
+    "FILE_PATH",
+    "FILE_ADDITIONS",
+    "FILE_DELETIONS",
+    "FILE_CHANGES",
+    "DIFF",
+)
+
+_DIFF_TYPES = {
+    "ORG": "VARCHAR",
+    "REPO": "VARCHAR",
+    "COMMIT_SHA": "VARCHAR",
+    "COMMIT_TIMESTAMP": "TIMESTAMP",
+    "COMMITTER_ID": "VARCHAR",
+    "COMMITTER_LOGIN": "VARCHAR",
+    "COMMITTER_NAME": "VARCHAR",
+    "COMMIT_MESSAGE": "VARCHAR",
+    "FILE_PATH": "VARCHAR",
+    "FILE_ADDITIONS": "INTEGER",
+    "FILE_DELETIONS": "INTEGER",
+    "FILE_CHANGES": "INTEGER",
+    "DIFF": "VARCHAR",
+}
+
+# All spooled batches land in one bulk insert at the end of the run
+LOAD_SPOOLED_DIFFS = f"""
+INSERT INTO "{T_TARGET_DIFFS}"
+SELECT {", ".join(_DIFF_COLS)}
+FROM read_json(
+    '{Path(SPOOL_DIR, "diffs_*.ndjson.gz").as_posix()}',
+    format = 'newline_delimited',
+    columns = {_DIFF_TYPES}
+)
+ON CONFLICT(ORG, REPO, COMMIT_SHA, FILE_PATH) DO NOTHING;
+"""
+
 
 # Helpers ----------------------------------------------------------------------
 def _get_committers_to_fetch(
@@ -100,35 +167,59 @@ def _get_committers_to_fetch(
     return users
 
 
-def _get_existing_commits_for_user(conn, committer_id: str) -> Set[str]:
-    """Return SHAs already stored for committer_id to avoid re-processing."""
+def _get_existing_commits(conn) -> Dict[str, Set[str]]:
+    """Return SHAs already stored per COMMITTER_ID to avoid re-processing."""
+    # one row per committer (GITHUB_DIFFS holds one row per file) so only the
+    # aggregated SHA lists cross into Python
     query = f"""
-        SELECT DISTINCT COMMIT_SHA
+        SELECT COMMITTER_ID, LIST(DISTINCT COMMIT_SHA)
         FROM "{T_TARGET_DIFFS}"
-        WHERE COMMITTER_ID = ?
+        GROUP BY COMMITTER_ID
     """
-    return {row[0] for row in conn.execute(query, [committer_id]).fetchall()}
+    existing: Dict[str, Set[str]] = defaultdict(set)
+    for committer_id, shas in conn.execute(query).fetchall():
+        existing[committer_id] = set(shas)
+    return existing
 
 
 # GitHub API calls -------------------------------------------------------------
-def _get_diff_for_file(file_obj: GHFile) -> Optional[str]:
+def _get_diff_for_file(file_obj: Dict[str, Any]) -> Optional[str]:
     """Return patch text for `file_obj`, or `None` if not applicable."""
-    # If the file was deleted, GitHub still lists it but there is no patch
-    if getattr(file_obj, "status", "") == "removed":
+    # If the file was deleted, GitHub still lists it but there is no patch;
+    # binary files carry no `patch` either, so they fall through as None
+    if file_obj.get("status") == "removed":
         return None
-    # PyGithub stores the diff text in the `patch` attribute
-    return getattr(file_obj, "patch", None)
+    return file_obj.get("patch")
 
 
-def _get_repos_for_org(org_name: str) -> List[GHRepository]:
-    """Fetch all repos for org. Returns an empty list on failure."""
+def _get_repos_for_org(org_name: str) -> List[Dict[str, Any]]:
+    """
+    Fetch lightweight repo records for org, newest-pushed first, via GraphQL. Returns an empty list on failure.
+    """
+    repos: List[Dict[str, Any]] = []
+    cursor: Optional[str] = None
     try:
-        org = _G.get_organization(org_name)
-        repos = list(org.get_repos(type="all"))
+        while True:
+            _, data = _G.requester.graphql_query(
+                query=_REPOS_QUERY,
+                variables={"org": org_name, "cursor": cursor},
+            )
+            org = (data.get("data") or {}).get("organization")
+            if org is None:
+                log.warning(
+                    "Organisation '%s' not found or token lacks permissions.",
+                    org_name,
+                )
+                return []
+
+            page = org["repositories"]
+            repos.extend(node for node in page["nodes"] if not node["isEmpty"])
+            if not page["pageInfo"]["hasNextPage"]:
+                break
+            cursor = page["pageInfo"]["endCursor"]
+
         log.info("%s: %d repositories fetched.", org_name, len(repos))
         return repos
-    except UnknownObjectException:
-        log.warning("Organisation '%s' not found or token lacks permissions.", org_name)
     except RateLimitExceededException:
         log.error("Rate limit exceeded while listing repos for '%s'.", org_name)
         raise  # escalate - upstream will decide how to proceed
@@ -137,23 +228,57 @@ def _get_repos_for_org(org_name: str) -> List[GHRepository]:
     return []
 
 
-def _fetch_commits_for_user_in_repo(
-    repo_obj: GHRepository,
+def _raise_for_status(resp: httpx.Response) -> None:
+    """Map non-2xx REST responses onto PyGithub's exception types."""
+    if resp.is_success:
+        return
+    try:
+        data = resp.json()
+    except ValueError:
+        data = {"message": resp.text}
+    headers = dict(resp.headers)
+    if (
+        resp.status_code in (403, 429)
+        and resp.headers.get("x-ratelimit-remaining") == "0"
+    ):
+        raise RateLimitExceededException(resp.status_code, data, headers)
+    raise GithubException(resp.status_code, data, headers)
+
+
+async def _fetch_commits(
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    repo: Dict[str, Any],
     committer_login: str,
     existing_commit_shas: Set[str],
-) -> List[GHCommit]:
-    """Return new commits by committer_login in repo_obj (capped)."""
-    commits: List[GHCommit] = []
+) -> List[Dict[str, Any]]:
+    """Return new commits by committer_login in repo (capped)."""
+    commits: List[Dict[str, Any]] = []
+    full_name = repo["nameWithOwner"]
     try:
-        for commit in repo_obj.get_commits(author=committer_login):  # paginated
-            if commit.sha in existing_commit_shas:
-                continue
-            commits.append(commit)
-            if len(commits) >= MAX_COMMITS_PER_REPO:  # per-repo guard
-                break
+        page = 1
+        async with sem:
+            while len(commits) < MAX_COMMITS_PER_REPO:
+                resp = await github_get(
+                    client,
+                    f"/repos/{full_name}/commits",
+                    params={"author": committer_login, "per_page": 100, "page": page},
+                    retries=HTTP_RETRIES,
+                )
+                _raise_for_status(resp)
+                batch = resp.json()
+                for commit in batch:
+                    if commit["sha"] in existing_commit_shas:
+                        continue
+                    commits.append(commit)
+                    if len(commits) >= MAX_COMMITS_PER_REPO:  # per-repo guard
+                        break
+                if len(batch) < 100:
+                    break
+                page += 1
         log.info(
             "%-40s | %s | %d new commits",
-            repo_obj.full_name,
+            full_name,
             committer_login,
             len(commits),
         )
@@ -161,24 +286,46 @@ def _fetch_commits_for_user_in_repo(
         log.error(
             "Rate limit while fetching commits for %s in %s.",
             committer_login,
-            repo_obj.full_name,
+            full_name,
         )
         raise
     except GithubException as exc:
         if "Git Repository is empty" in str(exc):
-            log.info("%-40s | %s | repo empty.", repo_obj.full_name, committer_login)
+            log.info("%-40s | %s | repo empty.", full_name, committer_login)
         else:
             log.error(
                 "Error fetching commits for %s in %s: %s",
                 committer_login,
-                repo_obj.full_name,
+                full_name,
                 exc,
             )
     return commits
 
 
+async def _fetch_files(
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    full_name: str,
+    sha: str,
+) -> List[Dict[str, Any]]:
+    """Return the file entries of one commit (one API round-trip)."""
+    async with sem:
+        resp = await github_get(
+            client, f"/repos/{full_name}/commits/{sha}", retries=HTTP_RETRIES
+        )
+    _raise_for_status(resp)
+    return resp.json().get("files") or []
+
+
+def _cancel_pending(tasks: List[asyncio.Task]) -> None:
+    """Cancel tasks that have not finished yet."""
+    for task in tasks:
+        task.cancel()
+
+
 # Database operations ----------------------------------------------------------
-def _insert_diff_rows(
+def _spool_diff_rows(
+    committer_login: str,
     rows: List[
         Tuple[
             str,  # ORG
@@ -197,33 +344,53 @@ def _insert_diff_rows(
         ]
     ],
 ) -> None:
-    """Batch-insert rows, ignoring conflicts."""
+    """Append rows to the committer's gzipped NDJSON spool file."""
     if not rows:
         return
 
+    SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    path = Path(SPOOL_DIR, f"diffs_{committer_login}.ndjson.gz")
+    with gzip.open(path, "at", encoding="utf-8") as fh:
+        for row in rows:
+            fh.write(json.dumps(dict(zip(_DIFF_COLS, row)), default=str))
+            fh.write("\n")
+    log.info("Spooled %d diffs to %s", len(rows), path.name)
+
+
+def _flush(committer_login: str, rows: List[Tuple]) -> None:
+    """Spool the buffered rows and empty the buffer in place."""
+    _spool_diff_rows(committer_login, rows)
+    rows.clear()
+
+
+def _load_spooled_diffs() -> None:
+    """Bulk-insert every spool file into GITHUB_DIFFS, then remove them."""
+    files = sorted(SPOOL_DIR.glob("diffs_*.ndjson.gz"))
+    if not files:
+        log.info("No spooled diffs to load.")
+        return
+
     with db_manager(DB_PATH) as conn:
         conn.execute(DDL_COMMIT_FILES)
-        conn.executemany(
-            f"""
-            INSERT INTO "{T_TARGET_DIFFS}" (
-                ORG, REPO, COMMIT_SHA, COMMIT_TIMESTAMP,
-                COMMITTER_ID, COMMITTER_LOGIN, COMMITTER_NAME, COMMIT_MESSAGE,
-                FILE_PATH, FILE_ADDITIONS, FILE_DELETIONS, FILE_CHANGES,
-                DIFF
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-            ON CONFLICT(ORG, REPO, COMMIT_SHA, FILE_PATH) DO NOTHING;
-            """,
-            rows,
-        )
+        inserted = conn.execute(LOAD_SPOOLED_DIFFS).fetchone()[0]
         conn.commit()
-    log.info("Inserted/updated %d diffs into %s", len(rows), T_TARGET_DIFFS)
+    log.info(
+        "Loaded %d new diffs from %d spool files into %s",
+        inserted,
+        len(files),
+        T_TARGET_DIFFS,
+    )
+    for path in files:
+        path.unlink()
 
 
 # Core logic -------------------------------------------------------------------
-def process_committer(
+async def process_committer(
+    client: httpx.AsyncClient,
     committer_login: str,
     committer_name: Optional[str],
-    repos: List[GHRepository],
+    repos: List[Dict[str, Any]],
+    existing: Set[str],
 ) -> None:
     """Stage diffs for committer_login until MAX_DIFFS_PER_USER is reached."""
     staged_rows: List[
@@ -232,80 +399,102 @@ def process_committer(
     diff_cap = MAX_DIFFS_PER_USER
     diff_cnt = 0
 
-    # look-up existing commit SHAs
-    with db_manager(DB_PATH) as conn:
-        existing = _get_existing_commits_for_user(conn, committer_login)
+    # share one string object per repeated value across the staged tuples
+    file_path_cache: Dict[str, str] = {}
 
-    # process repos newest-pushed first to bias toward recent work
-    repos.sort(
-        key=lambda r: r.pushed_at or datetime.min.replace(tzinfo=timezone.utc),
-        reverse=True,
-    )
+    repo_sem = asyncio.Semaphore(MAX_WORKERS_REPO_FETCH)
+    commit_sem = asyncio.Semaphore(MAX_WORKERS_COMMIT_FETCH)
 
-    for repo in repos:
-        if diff_cnt >= diff_cap:
+    # repos arrive newest-pushed first, biasing toward recent work; they are
+    # listed in windows of MAX_WORKERS_REPO_FETCH so that, as with the serial
+    # walk, no further repo is queried once the cap is reached
+    rate_limited = False
+    for start in range(0, len(repos), MAX_WORKERS_REPO_FETCH):
+        if diff_cnt >= diff_cap or rate_limited:
             break
+        window = repos[start : start + MAX_WORKERS_REPO_FETCH]
+        results = await asyncio.gather(
+            *(
+                _fetch_commits(client, repo_sem, repo, committer_login, existing)
+                for repo in window
+            ),
+            return_exceptions=True,
+        )
 
-        try:
-            commits = _fetch_commits_for_user_in_repo(repo, committer_login, existing)
-        except RateLimitExceededException:
-            return
-        except Exception as exc:
-            log.error(
-                "%s -> unexpected error for %s: %s",
-                repo.full_name,
-                committer_login,
-                exc,
-                exc_info=True,
-            )
-            continue
+        # results are consumed in repo order to keep the recency bias
+        file_tasks: List[Tuple[str, str, Dict[str, Any], asyncio.Task]] = []
+        for repo, result in zip(window, results):
+            if isinstance(result, RateLimitExceededException):
+                rate_limited = True
+                break
+            if isinstance(result, BaseException):
+                log.error(
+                    "%s -> unexpected error for %s: %s",
+                    repo["nameWithOwner"],
+                    committer_login,
+                    result,
+                    exc_info=result,
+                )
+                continue
 
-        commits.sort(
-            key=lambda c: c.commit.author.date if c.commit.author else datetime.min,
-            reverse=True,
-        )
+            # org / repo derivation, once per repo rather than per commit
+            full_name = repo["nameWithOwner"]
+            org_name, repo_name = (sys.intern(p) for p in full_name.split("/", 1))
 
-        for commit in commits:
-            if diff_cnt >= diff_cap:
+            commits = sorted(
+                result,
+                key=lambda c: (c["commit"]["author"] or {}).get("date") or "",
+                reverse=True,
+            )
+            file_tasks.extend(
+                (
+                    org_name,
+                    repo_name,
+                    commit,
+                    asyncio.create_task(
+                        _fetch_files(client, commit_sem, full_name, commit["sha"])
+                    ),
+                )
+                for commit in commits
+            )
+
+        for org_name, repo_name, commit, files_task in file_tasks:
+            if diff_cnt >= diff_cap or rate_limited:
                 break
+            sha = commit["sha"]
             try:
-                details = commit.commit
-                ts = details.author.date.astimezone(timezone.utc).replace(tzinfo=None)
-
-                # org / repo derivation
-                if commit.repository:
-                    org_name = commit.repository.owner.login
-                    repo_name = commit.repository.name
-                else:
-                    slug = (
-                        urlparse(commit.html_url).path.lstrip("/").split("/commit")[0]
-                    )
-                    org_name, repo_name = slug.split("/", 1)
-
-                author = commit.author or ""
-                committer_id = str(author.id) or ""
-                committer_login_actual = author.login or ""
-
-                for file_obj in commit.files or []:
+                files = await files_task
+                details = commit["commit"]
+                ts = datetime.fromisoformat(details["author"]["date"])
+                ts = ts.astimezone(_UTC).replace(tzinfo=None)
+
+                author = commit.get("author") or {}
+                committer_id = sys.intern(str(author.get("id") or ""))
+                committer_login_actual = sys.intern(author.get("login") or "")
+
+                for file_obj in files:
                     if diff_cnt >= diff_cap:
                         break
                     patch = _get_diff_for_file(file_obj)
                     if patch:
-                        additions = getattr(file_obj, "additions", 0)
-                        deletions = getattr(file_obj, "deletions", 0)
-                        changes = getattr(file_obj, "changes", additions + deletions)
+                        additions = file_obj.get("additions", 0)
+                        deletions = file_obj.get("deletions", 0)
+                        changes = file_obj.get("changes", additions + deletions)
+                        file_path = file_path_cache.setdefault(
+                            file_obj["filename"], file_obj["filename"]
+                        )
 
                         staged_rows.append(
                             (
                                 org_name,
                                 repo_name,
-                                commit.sha,
+                                sha,
                                 ts,
                                 committer_id,
                                 committer_login_actual,
-                                committer_name or author.name if author else "",
-                                details.message,
-                                file_obj.filename,
+                                committer_name or details["author"].get("name") or "",
+                                details["message"],
+                                file_path,
                                 additions,
                                 deletions,
                                 changes,
@@ -313,28 +502,59 @@ def process_committer(
                             )
                         )
                         diff_cnt += 1
+                        if len(staged_rows) >= DIFF_FLUSH_BATCH:
+                            _flush(committer_login, staged_rows)
             except RateLimitExceededException:
                 log.error(
                     "Rate limit while processing commit %s for %s.",
-                    commit.sha,
+                    sha,
                     committer_login,
                 )
-                break
+                rate_limited = True
             except GithubException as exc:
-                log.error("GitHub error on commit %s: %s", commit.sha, exc)
+                log.error("GitHub error on commit %s: %s", sha, exc)
             except Exception:
-                log.exception("Unexpected error on commit %s", commit.sha)
+                log.exception("Unexpected error on commit %s", sha)
+
+        # cap reached or rate-limited: drop file fetches still in flight
+        pending = [t for *_, t in file_tasks]
+        _cancel_pending(pending)
+        await asyncio.gather(*pending, return_exceptions=True)
 
-    _insert_diff_rows(staged_rows)
+    _flush(committer_login, staged_rows)
     log.info("%s -> staged %d/%d diffs.", committer_login, diff_cnt, diff_cap)
 
 
+async def _main_async(
+    committers: List[Tuple[str, Optional[str]]],
+    org_repos: List[Dict[str, Any]],
+    existing_by_user: Dict[str, Set[str]],
+) -> None:
+    """Process every committer over one shared HTTP connection pool."""
+    async with httpx.AsyncClient(
+        base_url=GITHUB_API_URL,
+        headers=github_headers(),
+        timeout=30.0,
+    ) as client:
+        for login, name in committers:
+            try:
+                await process_committer(
+                    client, login, name, org_repos, existing_by_user[login]
+                )
+            except RateLimitExceededException:
+                log.critical("Global rate-limit reached - stopping early.")
+                break
+            except Exception:
+                log.exception("Unhandled error processing %s", login)
+
+
 # Entry point ------------------------------------------------------------------
 def main() -> None:
     """Entry point."""
     with db_manager(DB_PATH) as conn:
         conn.execute(DDL_COMMIT_FILES)
         committers = _get_committers_to_fetch(conn)
+        existing_by_user = _get_existing_commits(conn)
 
     if not committers:
         log.info("No committers to process - exiting.")
@@ -345,16 +565,8 @@ def main() -> None:
         log.warning("No repositories returned for %s - exiting.", COMPANY_ORG_NAME)
         return
 
-    for login, name in committers:
-        try:
-            process_committer(login, name, org_repos)
-            # time.sleep(1)  # for API rates if needed
-        except RateLimitExceededException:
-            log.critical("Global rate-limit reached - stopping early.")
-            break
-        except Exception:
-            log.exception("Unhandled error processing %s", login)
-
+    asyncio.run(_main_async(committers, org_repos, existing_by_user))
+    _load_spooled_diffs()
     log.info("Diff collection complete.")
 
 
@@ -30,32 +30,32 @@ MAIN_DB = Path(DATA_DIR, f"{os.getenv('DUCKDB_NAME')}.duckdb")
 T_SRC = "PROJECTS"
 T_TARGET = "JIRA_EPICS"
 
+ATTACH_SRC = f"ATTACH '{MAIN_DB}' AS src (READ_ONLY);"
+DETACH_SRC = "DETACH src;"
+
 DDL = f"""
 CREATE OR REPLACE TABLE {T_TARGET} AS
 SELECT
     ID,
     KEY,
     NAME
-FROM "{SCHEMA_JIRA}"."{T_SRC}"
+FROM src."{SCHEMA_JIRA}"."{T_SRC}"
 """
 
 
 # Pipeline ---------------------------------------------------------------------
 def _create_epics():
-    with db_manager(STG_DB) as stg, db_manager(MAIN_DB, read_only=True) as main:
+    with db_manager(STG_DB) as stg:
         log.info("Creating %s from %s.%s", T_TARGET, SCHEMA_JIRA, T_SRC)
 
-        result = main.execute(f"""
-            SELECT
-                ID,
-                KEY,
-                NAME
-            FROM "{SCHEMA_JIRA}"."{T_SRC}"
-        """).fetchdf()
-
-        stg.register("TMP_EPICS", result)
-        stg.execute(f"CREATE OR REPLACE TABLE {T_TARGET} AS SELECT * FROM TMP_EPICS")
-        log.info("Wrote %d rows to %s", len(result), T_TARGET)
+        # main DB is attached read-only so the copy never leaves DuckDB
+        stg.execute(ATTACH_SRC)
+        try:
+            n = stg.execute(DDL).fetchone()[0]
+        finally:
+            stg.execute(DETACH_SRC)
+        stg.commit()
+        log.info("Wrote %d rows to %s", n, T_TARGET)
 
 
 # Entry point ------------------------------------------------------------------
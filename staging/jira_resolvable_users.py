@@ -50,6 +50,7 @@ SELECT DISTINCT ON (ASSIGNEE_DISPLAY_NAME)
     ASSIGNEE_EMAIL
 FROM {T_SOURCE}
 WHERE ASSIGNEE_DISPLAY_NAME IS NOT NULL
+ORDER BY ASSIGNEE_DISPLAY_NAME  -- PK order keeps conflict probes local
 ON CONFLICT (JIRA_DISPLAY_NAME) DO UPDATE SET
     JIRA_ID = excluded.JIRA_ID,
     JIRA_EMAIL = excluded.JIRA_EMAIL;
@@ -1,11 +1,17 @@
 from __future__ import annotations
 import os
+import httpx
+import atexit
+import asyncio
+import threading
+import copy
 import yaml
 import json
 import duckdb
 import logging
 from pathlib import Path
-from typing import Any, Dict
+from collections import OrderedDict
+from typing import Any, Dict, Literal
 from pydantic import BaseModel
 from arango import ArangoClient
 from contextlib import contextmanager
@@ -17,18 +23,48 @@ from agno.models.openrouter import OpenRouter
 
 log = logging.getLogger(__name__)
 
+# libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# orjson is optional; fall back to the stdlib encoder/decoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Parsed config files keyed by absolute path: (mtime, size, data)
+_YAML_CACHE: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+_YAML_CACHE_MAX = 100
+
+
+def _read_yaml(path: str | os.PathLike) -> Any:
+    """Parses a YAML file, reusing the cached result while its mtime/size are unchanged."""
+    cache_key = str(Path(path).resolve())
+    st = os.stat(cache_key)
+    cached = _YAML_CACHE.get(cache_key)
+    if cached and cached[0] == st.st_mtime and cached[1] == st.st_size:
+        _YAML_CACHE.move_to_end(cache_key)
+        return copy.deepcopy(cached[2])
+
+    with open(cache_key, "rb") as f:
+        data = yaml.load(f, Loader=_YamlLoader)
+    _YAML_CACHE[cache_key] = (st.st_mtime, st.st_size, data)
+    _YAML_CACHE.move_to_end(cache_key)
+    if len(_YAML_CACHE) > _YAML_CACHE_MAX:
+        _YAML_CACHE.popitem(last=False)
+    return copy.deepcopy(data)
+
 
 def load_yaml(file, key=None):
     """Loads YAML configuration file."""
     try:
-        path = CONFIG_DIR / f"{file}.yaml"
-        with open(path, "r") as f:
-            if key:
-                return yaml.safe_load(f)[key]
-            else:
-                return yaml.safe_load(f)
+        data = _read_yaml(CONFIG_DIR / f"{file}.yaml")
+        return data[key] if key else data
     except Exception as e:
-        log.error(f"Error loading {file}: {e}")
+        log.error("Error loading %s: %s", file, e)
 
 
 def resolve_model(
@@ -58,13 +94,45 @@ def resolve_model(
                     temperature=temperature,
                 )
     except Exception as e:
-        log.error(f"Error loading LLM provider/model: {e}")
+        log.error("Error loading LLM provider/model: %s", e)
+
+
+def _json_loads(text: str | bytes) -> Any:
+    """Decodes JSON with orjson when installed, else the stdlib."""
+    return orjson.loads(text) if orjson else json.loads(text)
+
+
+def _write_json(path: str | os.PathLike, obj: Any) -> None:
+    """Writes indented JSON to `path` with orjson when installed, else the stdlib."""
+    if orjson:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(obj, f, indent=2)
 
 
-def validate_response(output_content, response_model, savefile=None):
+def _write_parquet(path: str | os.PathLike, obj: Dict[str, Any]) -> None:
+    """Writes a single record to a zstd-compressed Parquet file (needs pyarrow)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq.write_table(pa.Table.from_pylist([obj]), path, compression="zstd")
+
+
+def validate_response(
+    output_content,
+    response_model,
+    savefile=None,
+    fmt: Literal["json", "parquet"] = "json",
+):
     """
     Validates an agent's structured response against the predefined schema. Response then saved to a JSON file (in test_outputs/ by default).
     """
+    # Already validated and nothing to save: skip the parse/construct machinery
+    if not savefile and isinstance(output_content, response_model):
+        return output_content
+
     try:
         # Convert to JSON if response not structured (like Google)
         if isinstance(output_content, str):
@@ -75,14 +143,16 @@ def validate_response(output_content, response_model, savefile=None):
             output_content = response_model(**output_content)
 
         if savefile:
-            output_path = DATA_DIR / f"{savefile}.json"
-            with open(output_path, "w") as f:
-                json.dump(output_content.model_dump(), f, indent=4)
-                log.info(f"Saved structured output to {output_path}")
+            output_path = DATA_DIR / f"{savefile}.{fmt}"
+            if fmt == "parquet":
+                _write_parquet(output_path, output_content.model_dump())
+            else:
+                _write_json(output_path, output_content.model_dump())
+            log.info("Saved structured output to %s", output_path)
 
         return output_content
     except IOError as e:
-        log.error(f"Failed to write output file {output_path}: {e}")
+        log.error("Failed to write output file %s: %s", output_path, e)
 
     # Handle case if content isn't a Pydantic model
     except AttributeError:
@@ -90,8 +160,7 @@ def validate_response(output_content, response_model, savefile=None):
 
         # Fallback: try saving raw content
         try:
-            with open(output_path.with_suffix(".raw.json"), "w") as f:
-                json.dump(output_content, f, indent=4)
+            _write_json(output_path.with_suffix(".raw.json"), output_content)
         except Exception:
             log.error("Could not save raw output content.")
             return None
@@ -99,6 +168,9 @@ def validate_response(output_content, response_model, savefile=None):
 
 def validate_output(output_content, schema):
     """Validates an agent's structured response to the predefined schema."""
+    if isinstance(output_content, schema):
+        return output_content
+
     try:
         # Convert to JSON if response not structured (like Google)
         if isinstance(output_content, str):
@@ -123,12 +195,13 @@ def parse_json(json_string: str):
         # Strip whitespace
         text = json_string.strip()
 
-        # Remove ticks if necessary
-        text = text.strip().strip("`")
-        if text.startswith("json"):
-            text = text[4:].strip()
+        # Remove ticks if necessary (bare JSON skips this entirely)
+        if not text.startswith(("{", "[")):
+            text = text.strip("`")
+            if text.startswith("json"):
+                text = text[4:].lstrip()
 
-        return json.loads(text)
+        return _json_loads(text)
     except (json.JSONDecodeError, TypeError):
         return None
 
@@ -139,21 +212,174 @@ def safe_json(blob: Any) -> Dict[str, Any]:
         return {}
     if isinstance(blob, dict):
         return blob
-    if isinstance(blob, (str, bytes, bytearray)):
+    if isinstance(blob, (str, bytes, bytearray, memoryview)):
+        # orjson takes buffers directly; the stdlib needs bytes
+        if isinstance(blob, memoryview) and not orjson:
+            blob = blob.tobytes()
         try:
-            return json.loads(blob)
-        except json.JSONDecodeError:
-            log.debug("Bad JSON blob ignored: %s", blob)
+            return _json_loads(blob)
+        except ValueError:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Bad JSON blob ignored: %s", blob)
     return {}
 
 
+class DuckDBPool:
+    """Keeps idle DuckDB connections per (path, read_only) for db_manager(pooled=True)."""
+
+    def __init__(self, max_connections: int = 4):
+        self.max_connections = max_connections
+        self._idle: Dict[tuple[str, bool], list[duckdb.DuckDBPyConnection]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path, read_only: bool) -> tuple[str, bool] | None:
+        if str(path).startswith(":memory:"):
+            return None
+        return str(Path(path).resolve()), read_only
+
+    def acquire(self, path, read_only: bool = False) -> duckdb.DuckDBPyConnection:
+        key = self._key(path, read_only)
+        if key:
+            with self._lock:
+                idle = self._idle.get(key)
+                if idle:
+                    return idle.pop()
+                # DuckDB refuses a second handle on the same file in the other mode
+                stale = self._idle.pop((key[0], not read_only), [])
+            for conn in stale:
+                conn.close()
+        return duckdb.connect(path, read_only=read_only)
+
+    def release(self, conn: duckdb.DuckDBPyConnection, path, read_only: bool = False):
+        key = self._key(path, read_only)
+        if key:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_connections:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            conns = [conn for idle in self._idle.values() for conn in idle]
+            self._idle.clear()
+        for conn in conns:
+            conn.close()
+
+
+_DB_POOL = DuckDBPool()
+atexit.register(_DB_POOL.close_all)
+
+
+def _db_pragmas() -> Dict[str, Any]:
+    """Default connection settings; read at call time since scripts load .env after import."""
+    pragmas = {"threads": os.cpu_count() or 4, "enable_object_cache": "true"}
+    # DuckDB's own default (80% of RAM) applies unless overridden
+    if os.getenv("DUCKDB_MEMORY_LIMIT"):
+        pragmas["memory_limit"] = f"'{os.environ['DUCKDB_MEMORY_LIMIT']}'"
+    return pragmas
+
+
 @contextmanager
-def db_manager(path: Path, *, read_only: bool = False):
-    conn = duckdb.connect(path, read_only=read_only)
+def db_manager(
+    path: Path,
+    *,
+    read_only: bool = False,
+    pragmas: dict | None = None,
+    pooled: bool = False,
+):
+    """Opens a DuckDB connection and closes it on exit.
+
+    pooled=True borrows from a process-wide pool instead. Only opt in when the
+    caller owns every use of the file: idle pooled handles keep the file
+    locked, block ATTACH of it, and carry TEMP tables/registrations/SETs over.
+    """
+    if pooled:
+        conn = _DB_POOL.acquire(path, read_only=read_only)
+    else:
+        conn = duckdb.connect(path, read_only=read_only)
     try:
+        for name, value in (_db_pragmas() if pragmas is None else pragmas).items():
+            conn.execute(f"PRAGMA {name}={value}")
         yield conn
-    finally:
+    except BaseException:
         conn.close()
+        raise
+    if pooled:
+        _DB_POOL.release(conn, path, read_only=read_only)
+    else:
+        conn.close()
+
+
+@contextmanager
+def unordered_inserts(conn):
+    """Lets DuckDB skip preserving input order for the enclosed statements.
+
+    Meant for CTAS over a GROUP BY, whose output order is arbitrary anyway. The
+    setting is database-wide, so the previous value is restored on exit.
+    """
+    prev = conn.execute(
+        "SELECT current_setting('preserve_insertion_order')"
+    ).fetchone()[0]
+    conn.execute("SET preserve_insertion_order = false")
+    try:
+        yield conn
+    finally:
+        conn.execute(f"SET preserve_insertion_order = {str(bool(prev)).lower()}")
+
+
+GITHUB_API_URL = "https://api.github.com"
+
+
+def github_headers() -> Dict[str, str]:
+    """REST headers for GITHUB_PERSONAL_ACCESS_TOKEN (read per call, after .env loads)."""
+    return {
+        "Authorization": f"Bearer {os.getenv('GITHUB_PERSONAL_ACCESS_TOKEN')}",
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+
+
+def github_retry_delay(resp: httpx.Response | None, attempt: int) -> float | None:
+    """Seconds to wait before retrying a GitHub call, or None if the outcome is final."""
+    if resp is None:  # connection reset / read error mid-request
+        return 2.0**attempt
+    if resp.status_code >= 500:
+        return 2.0**attempt
+    if resp.status_code in (403, 429):
+        # the primary limit (remaining == 0) is global; let it escalate
+        if resp.headers.get("x-ratelimit-remaining") == "0":
+            return None
+        # secondary limits carry retry-after, or at least say so in the body
+        if "retry-after" in resp.headers:
+            return float(resp.headers["retry-after"])
+        if "secondary rate limit" in resp.text.lower():
+            return 60.0
+    return None
+
+
+async def github_get(
+    client: httpx.AsyncClient,
+    url: str,
+    params: Dict[str, Any] | None = None,
+    retries: int = 3,
+) -> httpx.Response:
+    """GET with up to `retries` retries on 5xx, resets and secondary rate limits."""
+    for attempt in range(retries + 1):
+        try:
+            resp = await client.get(url, params=params)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+            resp = None
+        delay = github_retry_delay(resp, attempt) if attempt < retries else None
+        if delay is None:
+            return resp
+        status = resp.status_code if resp is not None else "connection error"
+        log.warning("GET %s failed (%s); retrying in %.0fs", url, status, delay)
+        await asyncio.sleep(delay)
 
 
 def pydantic_to_gemini(output_model: BaseModel) -> str:
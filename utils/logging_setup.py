@@ -1,10 +1,35 @@
 import sys
+import threading
 import logging
+from logging.handlers import MemoryHandler
+
+
+class _BufferedHandler(MemoryHandler):
+    """MemoryHandler whose daemon thread also flushes every `interval` seconds,
+    so buffered lines never wait on the next record (e.g. during an API call).
+    At most `interval` seconds of records are lost if the process is killed."""
+
+    def __init__(self, capacity, flushLevel, target, interval: float = 1.0):
+        super().__init__(capacity, flushLevel=flushLevel, target=target)
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._flush_periodically, args=(interval,), daemon=True
+        )
+        self._flusher.start()
+
+    def _flush_periodically(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        super().close()
 
 
 def setup_logging(
     level: int = logging.INFO,
     stream=None,
+    buffer: int = 1024,
 ) -> None:
     """
     Configures the root logger.
@@ -12,10 +37,16 @@ def setup_logging(
     Args:
         level: default overall log level (INFO by default)
         stream: if truthy, log to sys.stdout; otherwise caller adds own handlers
+        buffer: records batched before writing (flushed on ERROR, every 1s,
+            and at exit); 0 writes each record immediately
     """
     # Clearing existing handlers
     root_logger = logging.getLogger()
     if root_logger.hasHandlers():
+        for handler in root_logger.handlers:
+            handler.flush()
+            if isinstance(handler, _BufferedHandler):
+                handler.close()
         root_logger.handlers.clear()
 
     stdout = sys.stdout if stream else None
@@ -26,8 +57,18 @@ def setup_logging(
         stream=stdout,
     )
 
+    # Batch records in front of the stream handler; logging.shutdown flushes
+    # the buffer at exit
+    if buffer:
+        target = root_logger.handlers[0]
+        root_logger.handlers = [
+            _BufferedHandler(buffer, flushLevel=logging.ERROR, target=target)
+        ]
+
     # Quieten noisy libraries
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("httpcore").setLevel(logging.WARNING)
 
-    print(f"Logging configured with level: {logging.getLevelName(level)}")
+    logging.getLogger(__name__).info(
+        "Logging configured with level: %s", logging.getLevelName(level)
+    )
@@ -1,9 +1,26 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+import sys
+from enum import Enum
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import List, Optional
+
+
+class ItemType(str, Enum):
+    TABLE = "table"
+    COLUMN = "column"
+
+
+class RetrievalStatus(str, Enum):
+    FOUND_COMPLETE = "found_complete"
+    PARTIALLY_FOUND = "partially_found"
+    NOT_FOUND = "not_found"
+    NOT_EXPLICITLY_SEARCHED = "not_explicitly_searched"
 
 
 class MetadataItem(BaseModel):
-    type: Literal["table", "column"] = Field(..., description="Type of schema item.")
+    # Validated against the enum but stored as the plain string value
+    model_config = ConfigDict(use_enum_values=True)
+
+    type: ItemType = Field(..., description="Type of schema item.")
     source_system: str = Field(
         ..., description="Source system, e.g., 'github', 'jira'."
     )
@@ -13,6 +30,13 @@ class MetadataItem(BaseModel):
         None, description="Name of the column, if type is 'column'."
     )
 
+    # A handful of distinct names repeat across thousands of snippets; intern
+    # them so every snippet shares the same string objects
+    @field_validator("source_system", "schema_name", "table", "column", mode="after")
+    @classmethod
+    def intern_names(cls, v: Optional[str]) -> Optional[str]:
+        return sys.intern(v) if isinstance(v, str) else v
+
 
 class KBSnippet(BaseModel):
     document_id: str = Field(
@@ -28,13 +52,13 @@ class KBSnippet(BaseModel):
 
 
 class CriticalItemReport(BaseModel):
+    model_config = ConfigDict(use_enum_values=True)
+
     item_identifier: str = Field(
         ...,
         description="A unique string identifying the critical schema item from the checklist (e.g., 'GITHUB.USERS.EMAIL', 'JIRA.ISSUES.FIELDS.assignee').",
     )
-    status: Literal[
-        "found_complete", "partially_found", "not_found", "not_explicitly_searched"
-    ] = Field(
+    status: RetrievalStatus = Field(
         ..., description="Status of information retrieval for this critical item."
     )
     notes: Optional[str] = Field(
@@ -42,6 +66,11 @@ class CriticalItemReport(BaseModel):
         description="Brief notes if not 'found_complete', e.g., why it's partial or what was attempted.",
     )
 
+    @field_validator("item_identifier", mode="after")
+    @classmethod
+    def intern_identifier(cls, v: str) -> str:
+        return sys.intern(v)
+
 
 class KBInfo(BaseModel):
     query_used: str = Field(
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import logging
+
+from utils.helpers import db_manager
+from v2 import linked_identities, tables_by_names
+from v2.linked_identities import LINKS_TABLE, STG_DB
+
+log = logging.getLogger(__name__)
+
+# SQL blocks -------------------------------------------------------------------
+# Only the columns the aggregates read; JIRA_GITHUB_LINKS also carries every
+# other story column (JS.* EXCLUDE), so both runners scan this instead
+SQL_CREATE_JGL_SLIM = f"""
+CREATE OR REPLACE TEMP TABLE JGL_SLIM AS
+SELECT
+    JIRA_CREATOR_ID, JIRA_CREATOR_NAME, JIRA_CREATOR_EMAIL,
+    JIRA_REPORTER_ID, JIRA_REPORTER_NAME, JIRA_REPORTER_EMAIL,
+    JIRA_ASSIGNEE_ID, JIRA_ASSIGNEE_NAME, JIRA_ASSIGNEE_EMAIL,
+    STORY_ID,
+    STORY_KEY,
+    REPO,
+    GH_AUTHOR_ID, GH_AUTHOR_LOGIN, GH_AUTHOR_EMAIL,
+    GH_COMMITTER_ID, GH_COMMITTER_LOGIN, GH_COMMITTER_EMAIL,
+    PR_USER_ID, PR_USER_LOGIN
+FROM {LINKS_TABLE};
+"""
+
+
+# Runner -----------------------------------------------------------------------
+def main() -> None:
+    """Build LINKED_IDENTITIES and the BY_JIRA_*_NAME tables on one connection."""
+    with db_manager(STG_DB) as conn:
+        conn.execute(SQL_CREATE_JGL_SLIM)
+        try:
+            linked_identities.run(conn, source="JGL_SLIM")
+            tables_by_names.run(conn, source="JGL_SLIM")
+        finally:
+            conn.execute("DROP TABLE IF EXISTS JGL_SLIM;")
+        log.info("All link tables created.")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ import logging
 from pathlib import Path
 from dotenv import load_dotenv
 from scripts.paths import DATA_DIR
-from utils.helpers import db_manager
+from utils.helpers import db_manager, unordered_inserts
 from utils.logging_setup import setup_logging
 
 # Configuration ----------------------------------------------------------------
@@ -13,6 +13,7 @@ setup_logging()
 log = logging.getLogger(__name__)
 
 STG_DB = Path(DATA_DIR, f"{os.environ['DUCKDB_STAGING_NAME']}.duckdb")
+LINKS_TABLE = "JIRA_GITHUB_LINKS"
 
 # SQL blocks -------------------------------------------------------------------
 SQL_CREATE_LINKED_IDENTITIES = """
@@ -20,32 +21,33 @@ CREATE OR REPLACE TABLE LINKED_IDENTITIES AS
 SELECT
     JIRA_CREATOR_ID,
 
-    -- Aggregate into lists, with deduplication
-    ARRAY_DISTINCT(LIST(JIRA_CREATOR_NAME)) AS creator_names,
-    ARRAY_DISTINCT(LIST(JIRA_CREATOR_EMAIL)) AS creator_emails,
-    ARRAY_DISTINCT(LIST(JIRA_REPORTER_ID)) AS reporter_ids,
-    ARRAY_DISTINCT(LIST(JIRA_REPORTER_NAME)) AS reporter_names,
-    ARRAY_DISTINCT(LIST(JIRA_REPORTER_EMAIL)) AS reporter_emails,
-    ARRAY_DISTINCT(LIST(JIRA_ASSIGNEE_ID)) AS assignee_ids,
-    ARRAY_DISTINCT(LIST(JIRA_ASSIGNEE_NAME)) AS assignee_names,
-    ARRAY_DISTINCT(LIST(JIRA_ASSIGNEE_EMAIL)) AS assignee_emails,
-    ARRAY_DISTINCT(LIST(STORY_ID)) AS story_ids,
-    ARRAY_DISTINCT(LIST(STORY_KEY)) AS story_keys,
-    ARRAY_DISTINCT(LIST(REPO)) AS repos,
+    -- Aggregate into sorted lists, deduplicated as they are built (NULLs
+    -- dropped); sorted children compress better and read deterministically
+    COALESCE(LIST_SORT(LIST(DISTINCT JIRA_CREATOR_NAME) FILTER (JIRA_CREATOR_NAME IS NOT NULL)), []) AS creator_names,
+    COALESCE(LIST_SORT(LIST(DISTINCT JIRA_CREATOR_EMAIL) FILTER (JIRA_CREATOR_EMAIL IS NOT NULL)), []) AS creator_emails,
+    COALESCE(LIST_SORT(LIST(DISTINCT JIRA_REPORTER_ID) FILTER (JIRA_REPORTER_ID IS NOT NULL)), []) AS reporter_ids,
+    COALESCE(LIST_SORT(LIST(DISTINCT JIRA_REPORTER_NAME) FILTER (JIRA_REPORTER_NAME IS NOT NULL)), []) AS reporter_names,
+    COALESCE(LIST_SORT(LIST(DISTINCT JIRA_REPORTER_EMAIL) FILTER (JIRA_REPORTER_EMAIL IS NOT NULL)), []) AS reporter_emails,
+    COALESCE(LIST_SORT(LIST(DISTINCT JIRA_ASSIGNEE_ID) FILTER (JIRA_ASSIGNEE_ID IS NOT NULL)), []) AS assignee_ids,
+    COALESCE(LIST_SORT(LIST(DISTINCT JIRA_ASSIGNEE_NAME) FILTER (JIRA_ASSIGNEE_NAME IS NOT NULL)), []) AS assignee_names,
+    COALESCE(LIST_SORT(LIST(DISTINCT JIRA_ASSIGNEE_EMAIL) FILTER (JIRA_ASSIGNEE_EMAIL IS NOT NULL)), []) AS assignee_emails,
+    COALESCE(LIST_SORT(LIST(DISTINCT STORY_ID) FILTER (STORY_ID IS NOT NULL)), []) AS story_ids,
+    COALESCE(LIST_SORT(LIST(DISTINCT STORY_KEY) FILTER (STORY_KEY IS NOT NULL)), []) AS story_keys,
+    COALESCE(LIST_SORT(LIST(DISTINCT REPO) FILTER (REPO IS NOT NULL)), []) AS repos,
 
     -- GitHub identities (commits)
-    ARRAY_DISTINCT(LIST(GH_AUTHOR_ID)) AS gh_author_ids,
-    ARRAY_DISTINCT(LIST(GH_AUTHOR_LOGIN)) AS gh_author_logins,
-    ARRAY_DISTINCT(LIST(GH_AUTHOR_EMAIL)) AS gh_author_emails,
-    ARRAY_DISTINCT(LIST(GH_COMMITTER_ID)) AS gh_committer_ids,
-    ARRAY_DISTINCT(LIST(GH_COMMITTER_LOGIN)) AS gh_committer_logins,
-    ARRAY_DISTINCT(LIST(GH_COMMITTER_EMAIL)) AS gh_committer_emails,
+    COALESCE(LIST_SORT(LIST(DISTINCT GH_AUTHOR_ID) FILTER (GH_AUTHOR_ID IS NOT NULL)), []) AS gh_author_ids,
+    COALESCE(LIST_SORT(LIST(DISTINCT GH_AUTHOR_LOGIN) FILTER (GH_AUTHOR_LOGIN IS NOT NULL)), []) AS gh_author_logins,
+    COALESCE(LIST_SORT(LIST(DISTINCT GH_AUTHOR_EMAIL) FILTER (GH_AUTHOR_EMAIL IS NOT NULL)), []) AS gh_author_emails,
+    COALESCE(LIST_SORT(LIST(DISTINCT GH_COMMITTER_ID) FILTER (GH_COMMITTER_ID IS NOT NULL)), []) AS gh_committer_ids,
+    COALESCE(LIST_SORT(LIST(DISTINCT GH_COMMITTER_LOGIN) FILTER (GH_COMMITTER_LOGIN IS NOT NULL)), []) AS gh_committer_logins,
+    COALESCE(LIST_SORT(LIST(DISTINCT GH_COMMITTER_EMAIL) FILTER (GH_COMMITTER_EMAIL IS NOT NULL)), []) AS gh_committer_emails,
 
     -- GitHub identities (PRs)
-    ARRAY_DISTINCT(LIST(PR_USER_ID)) AS pr_user_ids,
-    ARRAY_DISTINCT(LIST(PR_USER_LOGIN)) AS pr_user_logins
+    COALESCE(LIST_SORT(LIST(DISTINCT PR_USER_ID) FILTER (PR_USER_ID IS NOT NULL)), []) AS pr_user_ids,
+    COALESCE(LIST_SORT(LIST(DISTINCT PR_USER_LOGIN) FILTER (PR_USER_LOGIN IS NOT NULL)), []) AS pr_user_logins
 
-FROM JIRA_GITHUB_LINKS
+FROM {source}
 WHERE JIRA_CREATOR_ID IS NOT NULL 
   AND JIRA_REPORTER_ID IS NOT NULL 
   AND JIRA_ASSIGNEE_ID IS NOT NULL
@@ -60,9 +62,19 @@ def _execute(conn, sql: str, table: str) -> None:
     log.info("%s refreshed — %d rows", table, n)
 
 
+def run(conn, source: str = LINKS_TABLE) -> None:
+    """Build LINKED_IDENTITIES from `source` on a caller-owned connection."""
+    with unordered_inserts(conn):
+        _execute(
+            conn,
+            SQL_CREATE_LINKED_IDENTITIES.format(source=source),
+            "LINKED_IDENTITIES",
+        )
+
+
 def main() -> None:
     with db_manager(STG_DB) as conn:
-        _execute(conn, SQL_CREATE_LINKED_IDENTITIES, "LINKED_IDENTITIES")
+        run(conn)
         log.info("Pipeline complete.")
 
 
@@ -5,7 +5,7 @@ from pathlib import Path
 from dotenv import load_dotenv
 from scripts.paths import DATA_DIR
 from utils.logging_setup import setup_logging
-from utils.helpers import db_manager
+from utils.helpers import db_manager, unordered_inserts
 
 # Configuration ----------------------------------------------------------------
 load_dotenv()
@@ -13,57 +13,87 @@ setup_logging()
 log = logging.getLogger(__name__)
 
 STG_DB = Path(DATA_DIR, f"{os.environ['DUCKDB_STAGING_NAME']}.duckdb")
+LINKS_TABLE = "JIRA_GITHUB_LINKS"
 
 # SQL blocks -------------------------------------------------------------------
+# One scan of the links table: UNPIVOT stacks the three name columns (dropping
+# NULL names) and a single GROUP BY aggregates every (role, name) pair.
+SQL_STAGE_NAME_AGG = """
+CREATE OR REPLACE TEMP TABLE JGL_BY_NAME AS
+SELECT
+    ROLE,
+    NAME,
+    COALESCE(LIST(DISTINCT STORY_ID) FILTER (STORY_ID IS NOT NULL), []) AS story_ids,
+    COALESCE(LIST(DISTINCT STORY_KEY) FILTER (STORY_KEY IS NOT NULL), []) AS story_keys,
+    COALESCE(LIST(DISTINCT REPO) FILTER (REPO IS NOT NULL), []) AS repos
+FROM (
+    UNPIVOT (
+        SELECT
+            JIRA_CREATOR_NAME AS CREATOR,
+            JIRA_REPORTER_NAME AS REPORTER,
+            JIRA_ASSIGNEE_NAME AS ASSIGNEE,
+            STORY_ID,
+            STORY_KEY,
+            REPO
+        FROM {source}
+    )
+    ON CREATOR, REPORTER, ASSIGNEE
+    INTO NAME ROLE VALUE NAME
+)
+GROUP BY ROLE, NAME;
+"""
+
 SQL_CREATE_BY_JIRA_CREATOR_NAME = """
 CREATE OR REPLACE TABLE BY_JIRA_CREATOR_NAME AS
-SELECT
-    JIRA_CREATOR_NAME,
-    ARRAY_DISTINCT(LIST(STORY_ID)) AS story_ids,
-    ARRAY_DISTINCT(LIST(STORY_KEY)) AS story_keys,
-    ARRAY_DISTINCT(LIST(REPO)) AS repos
-FROM JIRA_GITHUB_LINKS
-WHERE JIRA_CREATOR_NAME IS NOT NULL
-GROUP BY JIRA_CREATOR_NAME;
+SELECT NAME AS JIRA_CREATOR_NAME, story_ids, story_keys, repos
+FROM JGL_BY_NAME
+WHERE ROLE = 'CREATOR';
 """
 
 SQL_CREATE_BY_JIRA_REPORTER_NAME = """
 CREATE OR REPLACE TABLE BY_JIRA_REPORTER_NAME AS
-SELECT
-    JIRA_REPORTER_NAME,
-    ARRAY_DISTINCT(LIST(STORY_ID)) AS story_ids,
-    ARRAY_DISTINCT(LIST(STORY_KEY)) AS story_keys,
-    ARRAY_DISTINCT(LIST(REPO)) AS repos
-FROM JIRA_GITHUB_LINKS
-WHERE JIRA_REPORTER_NAME IS NOT NULL
-GROUP BY JIRA_REPORTER_NAME;
+SELECT NAME AS JIRA_REPORTER_NAME, story_ids, story_keys, repos
+FROM JGL_BY_NAME
+WHERE ROLE = 'REPORTER';
 """
 
 SQL_CREATE_BY_JIRA_ASSIGNEE_NAME = """
 CREATE OR REPLACE TABLE BY_JIRA_ASSIGNEE_NAME AS
-SELECT
-    JIRA_ASSIGNEE_NAME,
-    ARRAY_DISTINCT(LIST(STORY_ID)) AS story_ids,
-    ARRAY_DISTINCT(LIST(STORY_KEY)) AS story_keys,
-    ARRAY_DISTINCT(LIST(REPO)) AS repos
-FROM JIRA_GITHUB_LINKS
-WHERE JIRA_ASSIGNEE_NAME IS NOT NULL
-GROUP BY JIRA_ASSIGNEE_NAME;
+SELECT NAME AS JIRA_ASSIGNEE_NAME, story_ids, story_keys, repos
+FROM JGL_BY_NAME
+WHERE ROLE = 'ASSIGNEE';
 """
 
 
 # Runner -----------------------------------------------------------------------
+NAME_TABLES = {
+    "BY_JIRA_CREATOR_NAME": SQL_CREATE_BY_JIRA_CREATOR_NAME,
+    "BY_JIRA_REPORTER_NAME": SQL_CREATE_BY_JIRA_REPORTER_NAME,
+    "BY_JIRA_ASSIGNEE_NAME": SQL_CREATE_BY_JIRA_ASSIGNEE_NAME,
+}
+
+
 def _execute(conn, sql: str, table: str) -> None:
     conn.execute(sql)
     n = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
     log.info("%s refreshed — %d rows", table, n)
 
 
+def run(conn, source: str = LINKS_TABLE) -> None:
+    """Build the BY_JIRA_*_NAME tables from `source` on a caller-owned connection."""
+    with unordered_inserts(conn):
+        conn.execute(SQL_STAGE_NAME_AGG.format(source=source))
+    try:
+        # The splits only filter the staged aggregate, so run them in turn
+        for table, sql in NAME_TABLES.items():
+            _execute(conn, sql, table)
+    finally:
+        conn.execute("DROP TABLE IF EXISTS JGL_BY_NAME;")
+
+
 def main() -> None:
     with db_manager(STG_DB) as conn:
-        _execute(conn, SQL_CREATE_BY_JIRA_CREATOR_NAME, "BY_JIRA_CREATOR_NAME")
-        _execute(conn, SQL_CREATE_BY_JIRA_REPORTER_NAME, "BY_JIRA_REPORTER_NAME")
-        _execute(conn, SQL_CREATE_BY_JIRA_ASSIGNEE_NAME, "BY_JIRA_ASSIGNEE_NAME")
+        run(conn)
         log.info("All identity role tables created.")
 
 